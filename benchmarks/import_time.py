@@ -0,0 +1,104 @@
+"""
+冷启动导入耗时基准：在全新的子进程中多次导入插件模块，记录导入耗时的中位数，
+并检查 tos SDK 等较重的依赖是否被提前导入（它们应在首次传输时才加载）。
+requests/urllib3 由 dify_plugin 本身导入，不在检查范围内。
+
+用法：
+    python benchmarks/import_time.py [--modules tools,provider.volcengine_tos] [--runs 5] [--budget-ms 0] [--importtime]
+
+需要已安装 requirements.txt 中的依赖。任一模块提前导入了较重的依赖，或导入耗时中位数超过 --budget-ms 时以非零状态码退出。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 应延迟到首次传输时才导入的模块（requests/urllib3 已由 dify_plugin 导入，无法延迟）
+DEFERRED_MODULES = ('tos', 'crcmod')
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'loaded': [name for name in {deferred!r} if name in sys.modules]
+}}))
+"""
+
+
+def _measure(module, deferred):
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(module=module, deferred=deferred)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _slowest_imports(module, limit=15):
+    """使用 -X importtime 列出累计耗时最长的导入"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = [part.strip() for part in line[len('import time:'):].split('|')]
+        if parts[1].isdigit():
+            rows.append((int(parts[1]), parts[2]))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plugin cold-start import benchmark')
+    parser.add_argument('--modules', default='tools,provider.volcengine_tos', help='Modules to import, comma separated')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreter runs per module')
+    parser.add_argument('--budget-ms', type=float, default=0, help='Optional budget for the median import time')
+    parser.add_argument('--importtime', action='store_true', help='Also print the slowest imports per module')
+    parser.add_argument('--output', help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    results = []
+    failures = []
+    for module in [m.strip() for m in args.modules.split(',') if m.strip()]:
+        runs = [_measure(module, DEFERRED_MODULES) for _ in range(max(1, args.runs))]
+        loaded = sorted({name for run in runs for name in run['loaded']})
+        result = {
+            'module': module,
+            'median_ms': round(statistics.median(run['seconds'] for run in runs) * 1000, 1),
+            'min_ms': round(min(run['seconds'] for run in runs) * 1000, 1),
+            'eager_imports': loaded,
+            'budget_ms': args.budget_ms or None
+        }
+        result['passed'] = not loaded and (not args.budget_ms or result['median_ms'] <= args.budget_ms)
+        results.append(result)
+        if not result['passed']:
+            failures.append(result)
+
+    print(f"{'module':<28}{'median (ms)':>13}{'min (ms)':>10}  eager imports")
+    for result in results:
+        print(f"{result['module']:<28}{result['median_ms']:>13.1f}{result['min_ms']:>10.1f}  "
+              f"{', '.join(result['eager_imports']) or '-'}  {'ok' if result['passed'] else 'FAIL'}")
+
+    if args.importtime:
+        for result in results:
+            print(f"\nSlowest imports for {result['module']} (cumulative us):")
+            for cumulative, name in _slowest_imports(result['module']):
+                print(f"{cumulative:>10}  {name}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
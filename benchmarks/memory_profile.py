@@ -0,0 +1,363 @@
+"""
+内存峰值回归检查：使用本地TOS替身服务运行各工具，记录不同负载大小下的 tracemalloc 峰值内存，
+以及峰值内存与负载大小的比值；任一工具调用失败或超出 memory_budget.json 中配置的预算时以非零状态码退出。
+
+用法：
+    python benchmarks/memory_profile.py [--sizes 1,8,32] [--budget benchmarks/memory_budget.json]
+
+需要已安装 requirements.txt 中的依赖。
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 替身服务使用的虚拟域名，所有 *.STANDIN_DOMAIN 均解析到本机
+STANDIN_DOMAIN = 'tos-standin.local'
+BUCKET = 'profile-bucket'
+MIB = 1024 * 1024
+# 预热调用的负载大小：首次调用会导入 tos SDK、创建客户端等，这些一次性分配不计入峰值
+WARMUP_BYTES = 1024
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """
+    最小化的TOS替身：支持 PUT/GET/HEAD 对象、追加写、分片上传、列举对象，
+    以及 /__blob__/<size> 形式的公共读地址（同时用作Dify文件下载地址）；其余对象只接受带签名的请求
+    """
+    objects = {}
+    parts = {}
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _object_key(self):
+        return self.path.split('?', 1)[0].lstrip('/')
+
+    def _send(self, status, body=b'', headers=None, include_body=True):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-tos-request-id', 'standin')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if include_body and body:
+            self.wfile.write(body)
+
+    def _send_error(self, status, code, message, include_body=True):
+        # HEAD请求的错误响应不带响应体
+        body = json.dumps({'Code': code, 'Message': message}).encode() if include_body else b''
+        self._send(status, body, {'Content-Type': 'application/json'})
+
+    def _query(self):
+        return parse_qs(self.path.split('?', 1)[1], keep_blank_values=True) if '?' in self.path else {}
+
+    def _crc_headers(self, body):
+        from tos.utils import Crc64
+        crc = Crc64()
+        crc.update(body)
+        return {'ETag': f'"{len(body)}"', 'x-tos-hash-crc64ecma': str(crc.crc)}
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_PUT(self):
+        body = self._read_body()
+        query = self._query()
+        if 'partNumber' in query:
+            self.parts[(self._object_key(), int(query['partNumber'][0]))] = body
+        else:
+            self.objects[self._object_key()] = body
+        self._send(200, headers=self._crc_headers(body))
+
+    def do_POST(self):
+        key = self._object_key()
+        query = self._query()
+        body = self._read_body()
+        if 'append' in query:
+            content = self.objects.get(key, b'')[:int(query['offset'][0])] + body
+            self.objects[key] = content
+            headers = dict(self._crc_headers(content), **{'x-tos-next-append-offset': str(len(content))})
+            self._send(200, headers=headers)
+            return
+        if 'uploads' in query:
+            result = {'Bucket': BUCKET, 'Key': key, 'UploadId': 'standin'}
+            headers = {}
+        else:
+            numbers = [part['PartNumber'] for part in json.loads(body)['Parts']]
+            content = b''.join(self.parts.pop((key, number)) for number in numbers)
+            self.objects[key] = content
+            result = {'Bucket': BUCKET, 'Key': key, 'ETag': f'"{len(content)}"', 'Location': key}
+            headers = self._crc_headers(content)
+        headers['Content-Type'] = 'application/json'
+        self._send(200, json.dumps(result).encode(), headers)
+
+    def do_DELETE(self):
+        key = self._object_key()
+        for part in [part for part in self.parts if part[0] == key]:
+            del self.parts[part]
+        self._send(204)
+
+    def _list_objects(self, query):
+        prefix = query.get('prefix', [''])[0]
+        contents = []
+        for key, body in sorted(self.objects.items()):
+            if key.startswith(prefix) and '/' not in key[len(prefix):]:
+                contents.append({'Key': key, 'Size': len(body), 'ETag': f'"{len(body)}"',
+                                 'HashCrc64ecma': self._crc_headers(body)['x-tos-hash-crc64ecma']})
+        result = {'Name': BUCKET, 'Prefix': prefix, 'KeyCount': len(contents), 'IsTruncated': False,
+                  'EncodingType': '', 'Contents': contents}
+        self._send(200, json.dumps(result).encode(), {'Content-Type': 'application/json'})
+
+    def do_GET(self, include_body=True):
+        key = self._object_key()
+        query = self._query()
+        if not key:
+            # 列举对象；HEAD请求为 head_bucket（SDK在 head_object 返回404时用于区分存储桶是否存在）
+            if 'list-type' in query:
+                self._list_objects(query)
+            else:
+                self._send(200)
+            return
+        if key.startswith('__blob__/'):
+            body = b'x' * int(key.split('/', 1)[1])
+        elif not self.headers.get('Authorization'):
+            # 非公共读对象拒绝匿名请求，确保下载走SDK签名请求而不是匿名回退路径
+            self._send_error(403, 'AccessDenied', 'anonymous access denied', include_body)
+            return
+        else:
+            body = self.objects.get(key)
+        if body is None:
+            self._send_error(404, 'NoSuchKey', 'not found', include_body)
+            return
+        self._send(200, body, dict(self._crc_headers(body), **{
+            'Content-Type': 'application/octet-stream'
+        }), include_body=include_body)
+
+    def do_HEAD(self):
+        self.do_GET(include_body=False)
+
+
+def _run_standin(port_queue):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def _install_standin_resolver():
+    """
+    将 *.STANDIN_DOMAIN 解析到本机，其余域名按原逻辑解析
+
+    必须在导入 tools 之后调用：导入 tools 时 gevent 的 patch_all 会替换 socket.getaddrinfo，
+    之前安装的解析钩子会被覆盖。
+    """
+    original_getaddrinfo = socket.getaddrinfo
+
+    def _getaddrinfo(host, *args, **kwargs):
+        if isinstance(host, str) and (host == STANDIN_DOMAIN or host.endswith('.' + STANDIN_DOMAIN)):
+            host = '127.0.0.1'
+        return original_getaddrinfo(host, *args, **kwargs)
+
+    socket.getaddrinfo = _getaddrinfo
+
+
+def _make_file(port, size):
+    from dify_plugin.file.file import File
+    return File(
+        url=f'http://127.0.0.1:{port}/__blob__/{size}',
+        mime_type='application/octet-stream',
+        filename=f'payload-{size}.bin',
+        extension='.bin',
+        size=size,
+        type='document'
+    )
+
+
+def _drain(tool, parameters):
+    """执行工具并返回其JSON结果（只保留JSON消息，其余消息随即释放）"""
+    from dify_plugin.entities.tool import ToolInvokeMessage
+    result = None
+    for message in tool._invoke(parameters):
+        if message.type == ToolInvokeMessage.MessageType.JSON:
+            result = message.message.json_object
+        del message
+    return result
+
+
+def _check_result(result):
+    """检查工具的JSON结果，返回失败原因；调用成功且所有文件均通过CRC64校验时返回None"""
+    if result is None:
+        return 'no JSON result'
+    if result.get('error_count') or result.get('summary', {}).get('failed'):
+        return f"failed files: {[f for f in result.get('files', []) if f.get('status') == 'failed']}"
+    if result.get('status') not in (None, 'completed'):
+        return f"status {result.get('status')}"
+    for file_info in result.get('files', []):
+        if file_info.get('status') not in (None, 'success'):
+            return f"{file_info.get('filename')}: status {file_info.get('status')}"
+        integrity = file_info.get('integrity')
+        if integrity and integrity.get('status') != 'verified':
+            return f"{file_info.get('filename') or file_info.get('file_name')}: integrity {integrity.get('status')}"
+    return None
+
+
+def _profile_case(name, tool_cls, credentials, parameters_factory, payload_size):
+    tool = tool_cls.from_credentials(credentials)
+    parameters = parameters_factory(payload_size)
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        result = _drain(tool, parameters)
+        error = _check_result(result)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    peak_bytes = max(0, peak - baseline)
+    return {
+        'tool': name,
+        'payload_bytes': payload_size,
+        'peak_bytes': peak_bytes,
+        'peak_ratio': round(peak_bytes / payload_size, 2) if payload_size else 0,
+        'error': error
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tool memory regression gate')
+    parser.add_argument('--sizes', default='1,8,32', help='Payload sizes in MiB, comma separated')
+    parser.add_argument('--budget', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'memory_budget.json'))
+    parser.add_argument('--output', help='Optional path to write the results as JSON')
+    args = parser.parse_args()
+
+    with open(args.budget, encoding='utf-8') as f:
+        budget = json.load(f)
+    sizes = [int(float(size) * MIB) for size in args.sizes.split(',') if size.strip()]
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_run_standin, args=(port_queue,), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=10)
+
+    # 安装了 trio 时 httpcore 会导入 trio，而 trio 在 gevent 替换 select 模块（移除 epoll）后无法导入，
+    # 因此在导入 tools 之前先导入 httpcore（Dify文件通过 httpx 下载）
+    import httpcore  # noqa: F401
+    from tools import (AppendObjectTool, GetFileByUrlTool, MultiUploadFilesTool, PutTextObjectTool,
+                       SyncToPrefixTool, UploadFileTool)
+    from tools.utils import parse_tos_url
+
+    _install_standin_resolver()
+
+    class StandInGetFileByUrlTool(GetFileByUrlTool):
+        """替身服务只支持HTTP：保留URL中的协议，使下载走SDK的 get_object 路径"""
+
+        def _parse_tos_url(self, url):
+            bucket, endpoint, object_key = parse_tos_url(url)
+            return bucket, f"{url.split('://', 1)[0]}://{endpoint}", object_key
+
+    endpoint = f'{STANDIN_DOMAIN}:{port}'
+    credentials = {
+        'access_key_id': 'standin',
+        'access_key_secret': 'standin',
+        'endpoint': f'http://{endpoint}',
+        'bucket': BUCKET,
+        'region': 'cn-standin'
+    }
+
+    cases = [
+        ('upload_file', UploadFileTool, lambda size: {
+            'file': _make_file(port, size),
+            'directory': 'profile',
+            'filename': f'upload-{size}.bin',
+            'max_retries': 1
+        }),
+        ('multi_upload_files', MultiUploadFilesTool, lambda size: {
+            'files': [_make_file(port, size)],
+            'directory': 'profile-multi',
+            'max_retries': 1
+        }),
+        ('put_text_object', PutTextObjectTool, lambda size: {
+            'content': 'x' * size,
+            'directory': 'profile-text',
+            'filename': f'text-{size}.txt',
+            'max_retries': 1
+        }),
+        ('append_object', AppendObjectTool, lambda size: {
+            'object_key': f'profile-append/append-{size}.log',
+            'content': 'x' * size
+        }),
+        ('sync_to_prefix', SyncToPrefixTool, lambda size: {
+            'files': [_make_file(port, size)],
+            'prefix': f'profile-sync-{size}',
+            'max_retries': 1
+        }),
+        # 通过SDK签名请求下载 upload_file 上传的对象（替身服务拒绝该对象的匿名请求）
+        ('get_file_by_url', StandInGetFileByUrlTool, lambda size: {
+            'url': f'http://{BUCKET}.{endpoint}/profile/upload-{size}.bin'
+        }),
+        # 原始工具对URL中的endpoint使用https，对替身服务走匿名HTTP下载回退路径
+        ('get_file_by_url_anonymous', GetFileByUrlTool, lambda size: {
+            'url': f'http://{BUCKET}.{endpoint}/__blob__/{size}'
+        }),
+    ]
+
+    results = []
+    failures = []
+    try:
+        for name, tool_cls, parameters_factory in cases:
+            try:
+                _drain(tool_cls.from_credentials(credentials), parameters_factory(WARMUP_BYTES))
+            except Exception:
+                # 预热失败时，正式测量会记录同样的错误
+                pass
+        for size in sizes:
+            for name, tool_cls, parameters_factory in cases:
+                result = _profile_case(name, tool_cls, credentials, parameters_factory, size)
+                limit = budget.get(name, budget.get('default', {})).get('max_peak_ratio')
+                result['max_peak_ratio'] = limit
+                result['passed'] = result['error'] is None and (limit is None or result['peak_ratio'] <= limit)
+                results.append(result)
+                if not result['passed']:
+                    failures.append(result)
+    finally:
+        server.terminate()
+
+    print(f"{'tool':<28}{'payload (MiB)':>15}{'peak (MiB)':>14}{'ratio':>9}{'budget':>9}  status")
+    for result in results:
+        print(f"{result['tool']:<28}{result['payload_bytes'] / MIB:>15.1f}{result['peak_bytes'] / MIB:>14.2f}"
+              f"{result['peak_ratio']:>9.2f}{str(result['max_peak_ratio']):>9}  {'ok' if result['passed'] else 'FAIL'}")
+        if result['error']:
+            print(f"  error: {result['error']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,10 @@
 from dify_plugin import Plugin, DifyPluginEnv
 
+from tools.warmup import warm_up_from_env
+
 plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
 
 if __name__ == '__main__':
+    # 可选：预热 TOS_WARMUP_ENDPOINTS 中配置的访问域名（在共享连接池中建立校验证书的长连接）
+    warm_up_from_env()
     plugin.run()
@@ -1,13 +1,17 @@
 from typing import Any
 
-import tos
-from tos.auth import CredentialProviderAuth, StaticCredentialsProvider
 from dify_plugin import ToolProvider
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
 
+from tools.bootstrap import load_tos
+
 
 class VolcengineTosProvider(ToolProvider):
     def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 仅在验证凭据时才加载 tos SDK
+        tos = load_tos()
+        from tos.auth import CredentialProviderAuth, StaticCredentialsProvider
+
         try:
             # 1. 检查必要凭据是否存在
             required_fields = ['access_key_id', 'access_key_secret', 'endpoint', 'bucket']
@@ -0,0 +1,146 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from tools import copy_object
+from tools.copy_object import CopyObjectTool
+
+CREDENTIALS = {'endpoint': 'tos-cn-beijing.volces.com', 'bucket': 'my-bucket', 'access_key_id': 'ak',
+               'access_key_secret': 'sk'}
+
+
+class FakeClient(object):
+    """记录拷贝相关调用的TOS客户端"""
+
+    def __init__(self, size, is_default=False, fail_part=None):
+        self.calls = []
+        self.size = size
+        self.is_default = is_default
+        self.fail_part = fail_part
+        self.head = SimpleNamespace(
+            content_length=size, content_type='text/csv', cache_control='max-age=60',
+            content_disposition='attachment; filename="a.csv"', content_encoding='gzip', content_language='en',
+            expires=datetime(2030, 1, 1, tzinfo=timezone.utc), meta={'owner': 'team-a'},
+            storage_class='IA', website_redirect_location=None)
+        self.grants = ['public-read-grant']
+
+    def _record(self, name, **kwargs):
+        self.calls.append((name, kwargs))
+
+    def head_object(self, **kwargs):
+        self._record('head_object', **kwargs)
+        return self.head
+
+    def get_object_acl(self, **kwargs):
+        self._record('get_object_acl', **kwargs)
+        return SimpleNamespace(owner='owner', grants=self.grants, is_default=self.is_default)
+
+    def put_object_acl(self, **kwargs):
+        self._record('put_object_acl', **kwargs)
+
+    def copy_object(self, **kwargs):
+        self._record('copy_object', **kwargs)
+
+    def create_multipart_upload(self, **kwargs):
+        self._record('create_multipart_upload', **kwargs)
+        return SimpleNamespace(upload_id='upload-1')
+
+    def upload_part_copy(self, **kwargs):
+        self._record('upload_part_copy', **kwargs)
+        if kwargs['part_number'] == self.fail_part:
+            raise ConnectionError('part copy failed')
+        return SimpleNamespace(etag=f"etag-{kwargs['part_number']}")
+
+    def complete_multipart_upload(self, **kwargs):
+        self._record('complete_multipart_upload', **kwargs)
+
+    def abort_multipart_upload(self, **kwargs):
+        self._record('abort_multipart_upload', **kwargs)
+
+    def delete_object(self, **kwargs):
+        self._record('delete_object', **kwargs)
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+    def kwargs(self, name):
+        return [kwargs for call, kwargs in self.calls if call == name]
+
+
+def _copy(client, monkeypatch, move=False):
+    monkeypatch.setattr(copy_object, 'create_client', lambda *args, **kwargs: client)
+    tool = object.__new__(CopyObjectTool)
+    return tool._copy_objects({'pairs': 'data/a.csv -> archive/', 'move': move}, CREDENTIALS)
+
+
+def test_single_copy_keeps_storage_class_and_acl_before_deleting_source(monkeypatch):
+    client = FakeClient(size=10)
+
+    result = _copy(client, monkeypatch, move=True)
+
+    item = result['objects'][0]
+    assert item['status'] == 'success' and item['method'] == 'copy'
+    copy = client.kwargs('copy_object')[0]
+    assert copy['storage_class'] == 'IA'
+    assert copy['acl'] is None
+    assert client.kwargs('put_object_acl') == [{'bucket': 'my-bucket', 'key': 'archive/a.csv', 'owner': 'owner',
+                                                'grants': ['public-read-grant']}]
+    # 目标对象的ACL设置完成后才删除源对象
+    assert client.names()[-2:] == ['put_object_acl', 'delete_object']
+
+
+def test_default_acl_is_inherited_without_extra_request(monkeypatch):
+    from tos.enum import ACLType
+    client = FakeClient(size=10, is_default=True)
+
+    _copy(client, monkeypatch)
+
+    assert client.kwargs('copy_object')[0]['acl'] == ACLType.ACL_Default
+    assert 'put_object_acl' not in client.names()
+
+
+def test_multipart_copy_passes_source_metadata(monkeypatch):
+    monkeypatch.setattr(copy_object, 'MAX_SINGLE_COPY_SIZE', 100)
+    monkeypatch.setattr(copy_object, 'MIN_COPY_PART_SIZE', 64)
+    client = FakeClient(size=150)
+
+    result = _copy(client, monkeypatch, move=True)
+
+    item = result['objects'][0]
+    assert item['status'] == 'success' and item['method'] == 'multipart_copy' and item['parts'] == 3
+    create = client.kwargs('create_multipart_upload')[0]
+    head = client.head
+    assert create == {
+        'bucket': 'my-bucket', 'key': 'archive/a.csv', 'content_type': head.content_type,
+        'cache_control': head.cache_control, 'content_disposition': head.content_disposition,
+        'content_encoding': head.content_encoding, 'content_language': head.content_language,
+        'expires': head.expires, 'meta': head.meta, 'storage_class': head.storage_class,
+        'website_redirect_location': None, 'acl': None
+    }
+    ranges = sorted((c['copy_source_range_start'], c['copy_source_range_end'])
+                    for c in client.kwargs('upload_part_copy'))
+    assert ranges == [(0, 63), (64, 127), (128, 149)]
+    assert [part.part_number for part in client.kwargs('complete_multipart_upload')[0]['parts']] == [1, 2, 3]
+    assert client.names()[-2:] == ['put_object_acl', 'delete_object']
+
+
+def test_failed_multipart_copy_aborts_and_keeps_source(monkeypatch):
+    monkeypatch.setattr(copy_object, 'MAX_SINGLE_COPY_SIZE', 100)
+    monkeypatch.setattr(copy_object, 'MIN_COPY_PART_SIZE', 64)
+    client = FakeClient(size=150, fail_part=2)
+
+    result = _copy(client, monkeypatch, move=True)
+
+    assert result['objects'][0]['status'] == 'failed'
+    assert 'abort_multipart_upload' in client.names()
+    assert 'delete_object' not in client.names()
+    assert 'put_object_acl' not in client.names()
+
+
+def test_same_object_is_rejected(monkeypatch):
+    client = FakeClient(size=1)
+    monkeypatch.setattr(copy_object, 'create_client', lambda *args, **kwargs: client)
+
+    result = object.__new__(CopyObjectTool)._copy_objects({'pairs': 'a.csv -> a.csv'}, CREDENTIALS)
+
+    assert 'same object' in result['objects'][0]['error']
+    assert client.calls == []
@@ -0,0 +1,76 @@
+import time
+
+from tools import endpoint_selector
+from tools.endpoint_selector import EndpointSelector
+
+BUCKET = 'my-bucket'
+PRIMARY = 'tos-cn-beijing.volces.com'
+ACCELERATED = 'tos-accelerate.volces.com'
+
+
+class FakeProber(object):
+    """按主机返回预设的建连耗时，None表示探测失败"""
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.calls = []
+
+    def __call__(self, host, port):
+        self.calls.append((host, port))
+        return self.latencies[host]
+
+
+def _wait_for_probes(selector, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = selector.snapshot()
+        if stats and all(item['probes'] >= count for item in stats.values()):
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"probes did not finish: {selector.snapshot()}")
+
+
+def test_uses_primary_until_probed_then_switches_to_faster_endpoint():
+    prober = FakeProber({f"{BUCKET}.{PRIMARY}": 0.200, f"{BUCKET}.{ACCELERATED}": 0.020})
+    selector = EndpointSelector(prober=prober)
+
+    # 探测结果就绪之前使用主域名
+    assert selector.select(BUCKET, PRIMARY, [ACCELERATED]) == PRIMARY
+    _wait_for_probes(selector, 1)
+
+    assert selector.select(BUCKET, PRIMARY, [ACCELERATED]) == ACCELERATED
+    assert (f"{BUCKET}.{ACCELERATED}", 443) in prober.calls
+
+
+def test_switches_back_when_candidate_starts_failing():
+    prober = FakeProber({f"{BUCKET}.{PRIMARY}": 0.200, f"{BUCKET}.{ACCELERATED}": 0.020})
+    selector = EndpointSelector(prober=prober)
+    selector.select(BUCKET, PRIMARY, [ACCELERATED])
+    _wait_for_probes(selector, 1)
+    assert selector.select(BUCKET, PRIMARY, [ACCELERATED]) == ACCELERATED
+
+    # 候选域名探测失败后，失败率惩罚使其评分高于主域名
+    prober.latencies[f"{BUCKET}.{ACCELERATED}"] = None
+    selector._probe_group(BUCKET, (PRIMARY, ACCELERATED))
+    assert selector.select(BUCKET, PRIMARY, [ACCELERATED]) == PRIMARY
+
+
+def test_prober_exception_counts_as_failure_and_port_is_parsed():
+    def prober(host, port):
+        if host == f"{BUCKET}.{PRIMARY}":
+            raise OSError('unreachable')
+        assert port == 8443
+        return 0.050
+
+    selector = EndpointSelector(prober=prober)
+    selector.select(BUCKET, PRIMARY, [f"https://{ACCELERATED}:8443"])
+    _wait_for_probes(selector, 1)
+
+    assert selector.select(BUCKET, PRIMARY, [f"https://{ACCELERATED}:8443"]) == f"https://{ACCELERATED}:8443"
+    assert selector.snapshot()[f"{BUCKET}.{PRIMARY}"]['failure_rate'] == 1.0
+
+
+def test_select_endpoint_without_candidates_returns_primary():
+    credentials = {'endpoint': PRIMARY, 'bucket': BUCKET}
+    assert endpoint_selector.select_endpoint(credentials) == PRIMARY
+    assert endpoint_selector.select_endpoint(credentials, 'tos-cn-shanghai.volces.com') == 'tos-cn-shanghai.volces.com'
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from tools import idempotency
+from tools.idempotency import IdempotencyCache
+
+
+def _start_blocked_upload(cache, fingerprint):
+    """在后台线程中开始一次阻塞的上传，返回放行用的事件"""
+    started, release = threading.Event(), threading.Event()
+
+    def upload():
+        started.set()
+        release.wait(5)
+        return {'object_key': fingerprint}
+
+    thread = threading.Thread(target=cache.run, args=(fingerprint, upload), daemon=True)
+    thread.start()
+    assert started.wait(5)
+    return release, thread
+
+
+def test_completed_upload_is_replayed():
+    cache = IdempotencyCache()
+    calls = []
+
+    first = cache.run('a', lambda: calls.append(1) or {'etag': '1'})
+    second = cache.run('a', lambda: calls.append(1) or {'etag': '2'})
+
+    assert first == ({'etag': '1'}, False)
+    assert second == ({'etag': '1'}, True)
+    assert calls == [1]
+
+
+def test_waiting_for_in_progress_upload_times_out(monkeypatch):
+    monkeypatch.setenv(idempotency.IDEMPOTENCY_WAIT_TIMEOUT_ENV, '0.05')
+    cache = IdempotencyCache()
+    release, thread = _start_blocked_upload(cache, 'slow')
+
+    with pytest.raises(ValueError, match='still in progress'):
+        cache.run('slow', lambda: pytest.fail('duplicate upload started'))
+
+    release.set()
+    thread.join(5)
+    assert cache.run('slow', lambda: pytest.fail('completed upload not reused')) == ({'object_key': 'slow'}, True)
+
+
+def test_full_cache_evicts_completed_and_refuses_when_all_in_progress():
+    cache = IdempotencyCache(max_entries=2)
+    cache.run('done', lambda: 'done')
+    release, thread = _start_blocked_upload(cache, 'busy-1')
+
+    # 已完成的记录被淘汰，为新的上传腾出位置
+    other_release, other_thread = _start_blocked_upload(cache, 'busy-2')
+    assert list(cache._entries) == ['busy-1', 'busy-2']
+
+    with pytest.raises(ValueError, match='Too many uploads in progress'):
+        cache.run('busy-3', lambda: 'never')
+
+    release.set()
+    other_release.set()
+    thread.join(5)
+    other_thread.join(5)
+    assert cache.run('busy-3', lambda: 'now') == ('now', False)
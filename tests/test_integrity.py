@@ -0,0 +1,200 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from tools import integrity
+from tools.integrity import VerifiedUpload
+
+BUCKET = 'test-bucket'
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """最小化的TOS替身：支持 PUT 对象与分片上传，可指定返回错误CRC64的分片"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _key(self):
+        return self.path.split('?', 1)[0].lstrip('/')
+
+    def _query(self):
+        return parse_qs(self.path.split('?', 1)[1], keep_blank_values=True) if '?' in self.path else {}
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-tos-request-id', 'standin')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _crc_headers(self, body, corrupt=False):
+        from tos.utils import Crc64
+        crc = Crc64()
+        crc.update(body)
+        return {'ETag': f'"{len(body)}"', 'x-tos-hash-crc64ecma': str(crc.crc ^ (1 if corrupt else 0))}
+
+    def do_PUT(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if state['drop_next']:
+            # 模拟连接中断：读取请求后直接断开，不返回响应
+            state['drop_next'] -= 1
+            self.close_connection = True
+            return
+        query = self._query()
+        corrupt = False
+        if 'partNumber' in query:
+            number = int(query['partNumber'][0])
+            state['part_requests'].append(number)
+            state['parts'][number] = body
+            if number in state['corrupt_parts']:
+                state['corrupt_parts'].remove(number)
+                corrupt = True
+        else:
+            state['objects'][self._key()] = body
+        self._send(200, headers=self._crc_headers(body, corrupt))
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if 'uploads' in self._query():
+            result, headers = {'Bucket': BUCKET, 'Key': self._key(), 'UploadId': 'standin'}, {}
+        else:
+            numbers = [part['PartNumber'] for part in json.loads(body)['Parts']]
+            content = b''.join(state['parts'][number] for number in numbers)
+            state['objects'][self._key()] = content
+            result = {'Bucket': BUCKET, 'Key': self._key(), 'ETag': '"combined"', 'Location': self._key()}
+            headers = self._crc_headers(content)
+        headers['Content-Type'] = 'application/json'
+        self._send(200, json.dumps(result).encode(), headers)
+
+    def do_DELETE(self):
+        self._send(204)
+
+
+@pytest.fixture
+def standin():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    server.state = {'objects': {}, 'parts': {}, 'part_requests': [], 'corrupt_parts': set(),
+                    'drop_next': 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def client(standin):
+    tos = pytest.importorskip('tos')
+    return tos.TosClientV2('ak', 'sk', f'http://127.0.0.1:{standin.server_address[1]}', 'cn-test',
+                           is_custom_domain=True, enable_crc=False)
+
+
+@pytest.fixture
+def no_separate_crc_pass(monkeypatch):
+    """上传时CRC64应在发送内容的同时计算，不应再单独遍历一次内容"""
+    def fail(data):
+        raise AssertionError('upload content was hashed in a separate pass')
+    monkeypatch.setattr(integrity, 'crc64', fail)
+
+
+def test_put_object_checksum_is_computed_while_sending(standin, client, no_separate_crc_pass):
+    content = bytes(range(256)) * 4096
+    upload = VerifiedUpload(client, BUCKET, 'small.bin', content, 'application/octet-stream')
+
+    report = upload.run()
+
+    assert standin.state['objects']['small.bin'] == content
+    assert report['status'] == 'verified'
+    assert report['crc64'] == report['server_crc64']
+    assert upload.etag
+
+
+def test_precomputed_checksum_is_reused(standin, client, no_separate_crc_pass):
+    from tos.utils import Crc64
+    content = b'precomputed' * 1000
+    crc = Crc64()
+    crc.update(content)
+
+    report = VerifiedUpload(client, BUCKET, 'pre.bin', content, 'text/plain', crc64=crc.crc).run()
+
+    assert report['crc64'] == str(crc.crc)
+    assert report['status'] == 'verified'
+
+
+def test_sdk_retry_resends_body_and_restarts_checksum(standin, client, no_separate_crc_pass):
+    content = b'retry' * 50000
+    standin.state['drop_next'] = 1
+
+    report = VerifiedUpload(client, BUCKET, 'retry.bin', content, 'application/octet-stream').run()
+
+    assert standin.state['objects']['retry.bin'] == content
+    assert report['status'] == 'verified'
+    assert report['crc64'] == report['server_crc64']
+
+
+def test_empty_object(standin, client):
+    report = VerifiedUpload(client, BUCKET, 'empty.txt', b'', 'text/plain').run()
+
+    assert standin.state['objects']['empty.txt'] == b''
+    assert report['status'] == 'verified'
+
+
+def test_multipart_retries_only_mismatched_part(standin, client, monkeypatch, no_separate_crc_pass):
+    monkeypatch.setattr(integrity, 'MULTIPART_THRESHOLD', 64 * 1024)
+    monkeypatch.setattr(integrity, 'MIN_PART_SIZE', 32 * 1024)
+    content = bytes(range(256)) * 512
+    standin.state['corrupt_parts'].add(2)
+
+    report = VerifiedUpload(client, BUCKET, 'large.bin', content, 'application/octet-stream').run()
+
+    assert standin.state['objects']['large.bin'] == content
+    assert report['parts'] == 4
+    assert report['retried_parts'] == [2]
+    assert sorted(standin.state['part_requests']) == [1, 2, 2, 3, 4]
+    assert report['status'] == 'verified'
+
+
+def test_mismatch_raises(standin, client, monkeypatch):
+    monkeypatch.setattr(integrity, 'MULTIPART_THRESHOLD', 64 * 1024)
+    monkeypatch.setattr(integrity, 'MIN_PART_SIZE', 32 * 1024)
+    content = b'z' * (96 * 1024)
+    standin.state['corrupt_parts'].add(1)
+    monkeypatch.setattr(integrity, 'MAX_VERIFY_ATTEMPTS', 1)
+
+    with pytest.raises(ValueError, match='CRC64 mismatch for part 1'):
+        VerifiedUpload(client, BUCKET, 'bad.bin', content, 'application/octet-stream').run()
+
+
+def test_upload_with_retries_retries_failed_attempts(standin, client, monkeypatch):
+    calls = []
+    put_object = client.put_object
+
+    def flaky_put_object(**kwargs):
+        calls.append(kwargs['key'])
+        if len(calls) == 1:
+            raise ConnectionError('connection reset')
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(client, 'put_object', flaky_put_object)
+    monkeypatch.setattr(integrity.time, 'sleep', lambda seconds: None)
+    credentials = {'bucket': BUCKET, 'endpoint': 'standin', 'access_key_id': 'ak'}
+
+    report, etag = integrity.upload_with_retries(client, credentials, 'flaky.txt', b'hello', 'text/plain',
+                                                 max_retries=2)
+
+    assert calls == ['flaky.txt', 'flaky.txt']
+    assert report['status'] == 'verified'
+    assert etag == '5'
+
+    calls.clear()
+    with pytest.raises(ConnectionError):
+        integrity.upload_with_retries(client, credentials, 'flaky.txt', b'hello', 'text/plain', max_retries=1)
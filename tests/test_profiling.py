@@ -0,0 +1,52 @@
+import threading
+from types import SimpleNamespace
+
+from tools import profiling
+from tools.profiling import profiled
+
+
+class _Tool(object):
+    """开启性能分析的最小工具：产生JSON结果后等待放行"""
+
+    def __init__(self, release):
+        self.runtime = SimpleNamespace(credentials={'enable_profiling': True, 'bucket': 'b', 'endpoint': 'e'})
+        self.release = release
+
+    @profiled
+    def _invoke(self, tool_parameters):
+        yield SimpleNamespace(message=SimpleNamespace(json_object={'status': 'completed'}))
+        self.release.wait(5)
+        yield SimpleNamespace(message=SimpleNamespace(text='done'))
+
+
+def test_overlapping_invocations_skip_profiling_instead_of_failing(monkeypatch, tmp_path):
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+    release = threading.Event()
+    first = _Tool(release)._invoke({})
+    first_result = next(first).message.json_object
+
+    # 第一个调用仍在分析中时，在另一个线程中完整执行第二个调用
+    second = {}
+    released = threading.Event()
+    released.set()
+
+    def run_second():
+        try:
+            second['messages'] = list(_Tool(released)._invoke({}))
+        except Exception as e:
+            second['error'] = e
+
+    thread = threading.Thread(target=run_second)
+    thread.start()
+    thread.join(5)
+    release.set()
+    list(first)
+
+    assert 'error' not in second
+    assert second['messages'][0].message.json_object['profile']['status'] == 'skipped'
+    assert first_result['profile']['storage'] == 'local'
+    assert (tmp_path / first_result['profile']['path'].rsplit('/', 1)[-1]).exists()
+
+    # 分析结束后释放锁，后续调用可以再次分析
+    again = list(_Tool(released)._invoke({}))
+    assert again[0].message.json_object['profile']['storage'] == 'local'
@@ -0,0 +1,130 @@
+import base64
+import json
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import pytest
+
+from tools import select_object
+from tools.select_object import SelectObjectTool
+
+URL = 'https://my-bucket.tos-cn-beijing.volces.com/data/rows.csv'
+
+
+def _frame(headers, payload=b''):
+    """按事件流格式编码一帧（头部取值均为字符串类型）"""
+    encoded = b''.join(bytes([len(name)]) + name.encode() + b'\x07' + struct.pack('>H', len(value)) + value.encode()
+                       for name, value in headers.items())
+    prelude = struct.pack('>II', 12 + len(encoded) + len(payload) + 4, len(encoded))
+    prelude += struct.pack('>I', zlib.crc32(prelude))
+    message = prelude + encoded + payload
+    return message + struct.pack('>I', zlib.crc32(message))
+
+
+def _event(event_type, payload=b''):
+    return _frame({':message-type': 'event', ':event-type': event_type}, payload)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """最小化的TOS替身：记录查询请求，并返回预先设置的响应内容"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        state = self.server.state
+        path, _, query = self.path.partition('?')
+        state['requests'].append({
+            'path': path,
+            'query': parse_qs(query, keep_blank_values=True),
+            'authorization': self.headers.get('Authorization'),
+            'body': json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        })
+        body = state['response']
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('x-tos-request-id', 'standin')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    tos = pytest.importorskip('tos')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    server.state = {'requests': [], 'response': b''}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = tos.TosClientV2('ak', 'sk', f'http://127.0.0.1:{server.server_address[1]}', 'cn-beijing',
+                             is_custom_domain=True, max_retry_count=0)
+    monkeypatch.setattr(select_object, 'create_client', lambda *args, **kwargs: client)
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _select(**parameters):
+    tool = object.__new__(SelectObjectTool)
+    tool.runtime = SimpleNamespace(credentials={'endpoint': 'tos-cn-beijing.volces.com', 'bucket': 'my-bucket',
+                                                'access_key_id': 'ak', 'access_key_secret': 'sk'})
+    return tool._select_object(dict({'url': URL, 'sql': 'SELECT * FROM ossobject'}, **parameters))
+
+
+def test_records_are_collected_from_framed_events(standin):
+    standin.state['response'] = (_event('Records', b'a,1\n') + _event('Cont') + _event('Records', b'b,2\n')
+                                 + _event('Stats', b'<Stats><BytesScanned>100</BytesScanned>'
+                                                   b'<BytesReturned>8</BytesReturned></Stats>')
+                                 + _event('End'))
+
+    result = _select(sql="SELECT * FROM ossobject WHERE _2 > 0", compression='gzip', csv_header='none')
+
+    assert result['records'] == 'a,1\nb,2\n'
+    assert result['bytes_returned'] == 8
+    assert result['truncated'] is False
+    assert result['stats'] == {'bytes_scanned': 100, 'bytes_returned': 8}
+
+    request = standin.state['requests'][0]
+    assert request['path'] == '/data/rows.csv'
+    assert 'select' in request['query']
+    assert request['authorization'].startswith('TOS4-HMAC-SHA256 ')
+    assert base64.b64decode(request['body']['Expression']).decode() == "SELECT * FROM ossobject WHERE _2 > 0"
+    assert request['body']['InputSerialization']['CompressionType'] == 'GZIP'
+    assert request['body']['InputSerialization']['CSV']['FileHeaderInfo'] == 'NONE'
+
+
+def test_result_is_capped_at_max_result_bytes(standin):
+    standin.state['response'] = _event('Records', b'x' * 10) + _event('Records', b'y' * 10)
+
+    result = _select(max_result_bytes=15)
+
+    assert result['records'] == 'x' * 10 + 'y' * 5
+    assert result['truncated'] is True
+
+
+def test_error_event_raises(standin):
+    standin.state['response'] = _event('Records', b'a\n') + _frame(
+        {':message-type': 'error', ':error-code': 'InvalidSql', ':error-message': 'syntax error'})
+
+    with pytest.raises(ValueError, match='InvalidSql syntax error'):
+        _select()
+
+
+def test_missing_end_event_raises(standin):
+    standin.state['response'] = _event('Records', b'a\n')
+
+    with pytest.raises(ValueError, match='before the End event'):
+        _select()
+
+
+@pytest.mark.parametrize('response', [b'a,1\nb,2\n' * 4, _event('Records', b'a\n')[:-1] + b'\x00'])
+def test_unframed_or_corrupt_response_raises(standin, response):
+    standin.state['response'] = response
+
+    with pytest.raises(ValueError, match='framing|middle of a frame'):
+        _select()
@@ -0,0 +1,115 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tools import sync_to_prefix
+from tools.sync_to_prefix import MANIFEST_NAME, SyncToPrefixTool
+
+CREDENTIALS = {'endpoint': 'tos-cn-beijing.volces.com', 'bucket': 'my-bucket', 'access_key_id': 'ak',
+               'access_key_secret': 'sk'}
+
+
+def _crc64(data):
+    from tos.utils import Crc64
+    crc = Crc64()
+    crc.update(data)
+    return crc.crc
+
+
+class NamedFile(io.BytesIO):
+    """记录读取次数的文件对象"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.reads = 0
+
+    def read(self, *args):
+        self.reads += 1
+        return super().read(*args)
+
+
+class FakeClient(object):
+    """内存中的TOS客户端：支持同步工具用到的列举、读写与批量删除"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = []
+        self.deleted = []
+
+    def list_objects_type2(self, bucket, prefix, delimiter, continuation_token, max_keys, list_only_once):
+        contents = [SimpleNamespace(key=key, size=len(data), etag=f'"{key}-{len(data)}-"',
+                                    hash_crc64_ecma=_crc64(data))
+                    for key, data in sorted(self.objects.items())
+                    if key.startswith(prefix) and '/' not in key[len(prefix):]]
+        return SimpleNamespace(contents=contents, is_truncated=False, next_continuation_token=None)
+
+    def get_object(self, bucket, key):
+        return io.BytesIO(self.objects[key])
+
+    def put_object(self, bucket, key, content, content_type=None, data_transfer_listener=None, **options):
+        data = content if isinstance(content, bytes) else content.read()
+        self.objects[key] = data
+        self.puts.append(key)
+        return SimpleNamespace(etag=f'"{key}-{len(data)}-"', hash_crc64_ecma=_crc64(data))
+
+    def delete_multi_objects(self, bucket, objects, quiet):
+        for obj in objects:
+            self.deleted.append(obj.key)
+            self.objects.pop(obj.key, None)
+        return SimpleNamespace(error=[])
+
+
+def _run(client, monkeypatch, files, prefix='kb', **parameters):
+    monkeypatch.setattr(sync_to_prefix, 'create_client', lambda *args, **kwargs: client)
+    sync_to_prefix._manifest_cache.clear()
+    tool = object.__new__(SyncToPrefixTool)
+    return tool._sync(dict(parameters, files=files, prefix=prefix), CREDENTIALS)
+
+
+def test_sync_uploads_only_changes_and_reads_each_file_once(monkeypatch):
+    client = FakeClient()
+    client.objects.update({'kb/same.txt': b'same', 'kb/edit.txt': b'old!', 'kb/gone.txt': b'gone'})
+    files = [NamedFile('same.txt', b'same'), NamedFile('edit.txt', b'new!'), NamedFile('add.txt', b'added')]
+
+    result = _run(client, monkeypatch, files, delete_extras=True)
+
+    actions = {item['filename']: (item['action'], item['status']) for item in result['files']}
+    assert actions == {'same.txt': ('unchanged', 'success'), 'edit.txt': ('changed', 'success'),
+                       'add.txt': ('new', 'success'), 'gone.txt': ('deleted', 'success')}
+    assert sorted(client.puts) == ['kb/.tos-sync-manifest.json', 'kb/add.txt', 'kb/edit.txt']
+    assert client.deleted == ['kb/gone.txt']
+    assert client.objects['kb/edit.txt'] == b'new!'
+    assert [f.reads for f in files] == [1, 1, 1]
+    assert result['bytes_saved'] == 4
+    assert result['bytes_uploaded'] == 9
+
+    manifest = json.loads(client.objects['kb/' + MANIFEST_NAME])['objects']
+    assert set(manifest) == {'same.txt', 'edit.txt', 'add.txt'}
+    assert manifest['add.txt']['crc64'] == str(_crc64(b'added'))
+
+
+def test_dry_run_does_not_read_new_or_resized_files(monkeypatch):
+    client = FakeClient()
+    client.objects.update({'kb/resized.txt': b'short'})
+    files = [NamedFile('resized.txt', b'much longer'), NamedFile('add.txt', b'added')]
+
+    result = _run(client, monkeypatch, files, dry_run=True)
+
+    assert {item['filename']: item['status'] for item in result['files']} == {'resized.txt': 'pending',
+                                                                             'add.txt': 'pending'}
+    assert result['summary']['new'] == 1 and result['summary']['changed'] == 1
+    assert [f.reads for f in files] == [0, 0]
+    assert client.puts == []
+
+
+@pytest.mark.parametrize('prefix', ['', '   ', None])
+def test_empty_prefix_is_rejected(monkeypatch, prefix):
+    client = FakeClient()
+    client.objects.update({'root.txt': b'root'})
+
+    with pytest.raises(ValueError, match='Missing required parameter: prefix'):
+        _run(client, monkeypatch, [NamedFile('add.txt', b'added')], prefix=prefix, delete_extras=True)
+    assert client.puts == [] and client.deleted == []
@@ -0,0 +1,212 @@
+import io
+import threading
+import time
+
+from tools import transfer_scheduler as transfer_scheduler_module
+from tools.transfer_scheduler import READ_CHUNK_SIZE, SMALL_TRANSFER_BYTES, TransferScheduler
+
+CREDENTIALS = {'endpoint': 'tos-cn-beijing.volces.com', 'bucket': 'my-bucket', 'access_key_id': 'ak'}
+OWNER = ('tos-cn-beijing.volces.com', 'my-bucket', 'ak')
+OTHER_OWNER = ('tos-cn-beijing.volces.com', 'other-bucket', 'ak2')
+MB = 1024 * 1024
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.content_length = len(data)
+
+
+def _download(scheduler, credentials, data, size=None, wrap=None):
+    """通过调度器下载data，返回 (内容, 每次发起请求时已占用的通道数)"""
+    active = []
+
+    def request(options):
+        active.append(scheduler._active_total)
+        return FakeResponse(data)
+
+    return scheduler.download(credentials, request, size=size, wrap=wrap)[2], active
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def _queue(scheduler, requests):
+    """
+    依次将 (owner, size, 已等待秒数) 加入调度队列，每个传输获取通道后立即释放
+
+    Returns:
+        tuple: (获取到通道的顺序列表, 线程列表)
+    """
+    order = []
+    threads = []
+
+    def run(owner, size):
+        scheduler._acquire(owner, size)
+        order.append((owner, size))
+        scheduler._release(owner)
+
+    for owner, size, waited in requests:
+        thread = threading.Thread(target=run, args=(owner, size))
+        thread.start()
+        _wait_until(lambda: len(scheduler._waiters) == len(threads) + 1)
+        scheduler._waiters[-1].enqueued_at -= waited
+        threads.append(thread)
+    return order, threads
+
+
+def _drain(scheduler, holders, threads):
+    for owner in holders:
+        scheduler._release(owner)
+    for thread in threads:
+        thread.join(5)
+    assert scheduler._active_total == 0
+
+
+def test_small_response_is_not_queued_or_limited():
+    scheduler = TransferScheduler()
+    data = b'x' * SMALL_TRANSFER_BYTES
+    credentials = dict(CREDENTIALS, bandwidth_limit='1')
+
+    assert _download(scheduler, credentials, data) == (data, [0])
+    assert _download(scheduler, credentials, data, size=len(data)) == (data, [0])
+    assert scheduler._limiters == {}
+
+
+class RecordingLimiter(object):
+    """每个块第一次申请令牌时返回需要等待，用于验证限速路径"""
+
+    def __init__(self):
+        self.granted = []
+        self.denied = 0
+
+    def acquire(self, want):
+        from tos.utils import TokenBucketResult
+        if self.denied <= len(self.granted):
+            self.denied += 1
+            return TokenBucketResult(False, 0.001)
+        self.granted.append(want)
+        return TokenBucketResult(True, 0)
+
+
+def test_download_with_bandwidth_limit_goes_through_rate_limiter():
+    scheduler = TransferScheduler()
+    data = bytes(range(256)) * (3 * 1024 * 1024 // 256)
+    credentials = dict(CREDENTIALS, bandwidth_limit='4')
+    limiter = RecordingLimiter()
+    scheduler._limiters[OWNER] = (4 * 1024 * 1024, limiter)
+
+    assert _download(scheduler, credentials, data, size=len(data)) == (data, [1])
+    assert sum(limiter.granted) == len(data)
+    assert limiter.denied == len(limiter.granted) == len(data) // READ_CHUNK_SIZE
+    assert scheduler._active_total == 0
+
+
+def test_download_with_real_rate_limiter_and_wrapped_reader():
+    scheduler = TransferScheduler()
+    data = b'y' * (2 * 1024 * 1024)
+    credentials = dict(CREDENTIALS, bandwidth_limit='8')
+    wrapped = []
+
+    def wrap(response):
+        wrapped.append(response)
+        return response
+
+    # 大小未知且有空闲通道时，直接占用通道读取已发起的响应
+    assert _download(scheduler, credentials, data, wrap=wrap) == (data, [0])
+    assert len(wrapped) == 1
+    assert scheduler._get_limiter(OWNER, credentials) is not None
+    assert scheduler._active_total == 0
+
+
+def test_queued_download_does_not_hold_an_open_response(monkeypatch):
+    monkeypatch.setenv(transfer_scheduler_module.MAX_LARGE_TRANSFERS_ENV, '1')
+    scheduler = TransferScheduler()
+    data = b'z' * (2 * MB)
+    responses = []
+
+    def request(options):
+        responses.append(FakeResponse(data))
+        return responses[-1]
+
+    # 已知为大下载时，排队期间不发起请求
+    scheduler._acquire(OTHER_OWNER, 10 * MB)
+    known = []
+    thread = threading.Thread(target=lambda: known.append(scheduler.download(CREDENTIALS, request, size=len(data))))
+    thread.start()
+    _wait_until(lambda: len(scheduler._waiters) == 1)
+    assert responses == []
+    scheduler._release(OTHER_OWNER)
+    thread.join(5)
+    assert known[0][2] == data
+    assert len(responses) == 1
+
+    # 大小未知时发现是大下载且需要排队，先关闭已打开的响应，获取通道后重新请求
+    scheduler._acquire(OTHER_OWNER, 10 * MB)
+    unknown = []
+    thread = threading.Thread(target=lambda: unknown.append(scheduler.download(CREDENTIALS, request)))
+    thread.start()
+    _wait_until(lambda: len(scheduler._waiters) == 1)
+    assert len(responses) == 2 and responses[1].closed
+    scheduler._release(OTHER_OWNER)
+    thread.join(5)
+    assert unknown[0][0] is responses[2]
+    assert unknown[0][2] == data
+    assert scheduler._active_total == 0
+
+
+def test_queue_schedules_small_transfers_before_large(monkeypatch):
+    monkeypatch.setenv(transfer_scheduler_module.MAX_LARGE_TRANSFERS_ENV, '1')
+    scheduler = TransferScheduler()
+    scheduler._acquire(OTHER_OWNER, 10 * MB)
+
+    order, threads = _queue(scheduler, [(OWNER, 500 * MB, 0), (OWNER, 2 * MB, 0), (OWNER, 50 * MB, 0)])
+    _drain(scheduler, [OTHER_OWNER], threads)
+
+    assert order == [(OWNER, 2 * MB), (OWNER, 50 * MB), (OWNER, 500 * MB)]
+
+
+def test_queue_schedules_least_active_owner_first(monkeypatch):
+    monkeypatch.setenv(transfer_scheduler_module.MAX_LARGE_TRANSFERS_ENV, '2')
+    scheduler = TransferScheduler()
+    scheduler._acquire(OWNER, 10 * MB)
+    scheduler._acquire(OWNER, 10 * MB)
+
+    # OWNER 仍占用一个通道时，即使 OTHER_OWNER 的传输更大也先调度
+    order, threads = _queue(scheduler, [(OWNER, 2 * MB, 0), (OTHER_OWNER, 500 * MB, 0)])
+    scheduler._release(OWNER)
+    _wait_until(lambda: len(order) == 2)
+    _drain(scheduler, [OWNER], threads)
+
+    assert order == [(OTHER_OWNER, 500 * MB), (OWNER, 2 * MB)]
+
+
+def test_queue_ages_long_waiting_large_transfers(monkeypatch):
+    monkeypatch.setenv(transfer_scheduler_module.MAX_LARGE_TRANSFERS_ENV, '1')
+    scheduler = TransferScheduler()
+    scheduler._acquire(OTHER_OWNER, 10 * MB)
+
+    # 已等待 10 个 AGING_SECONDS 的 500 MB 传输，排序大小衰减到 0.5 MB 以下，先于新到的 2 MB 传输
+    waited = 10 * transfer_scheduler_module.AGING_SECONDS
+    order, threads = _queue(scheduler, [(OWNER, 500 * MB, waited), (OWNER, 2 * MB, 0)])
+    _drain(scheduler, [OTHER_OWNER], threads)
+
+    assert order == [(OWNER, 500 * MB), (OWNER, 2 * MB)]
+
+
+def test_transfer_yields_server_and_limiter_options():
+    scheduler = TransferScheduler()
+    credentials = dict(CREDENTIALS, bandwidth_limit='2', server_traffic_limit='1')
+
+    with scheduler.transfer(credentials, 10 * 1024 * 1024) as options:
+        assert options['traffic_limit'] == 8 * 1024 * 1024
+        assert options['rate_limiter'] is not None
+        assert scheduler._active_total == 1
+    assert scheduler._active_total == 0
+
+    with scheduler.transfer(credentials, 1024) as options:
+        assert options == {}
@@ -0,0 +1,115 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from dify_plugin.file.file import File
+
+from tools import upload_jobs as upload_jobs_module
+from tools.upload_file import UploadFileTool
+from tools.upload_jobs import UploadJobManager
+
+OWNER = ('tos-cn-beijing.volces.com', 'my-bucket', 'ak')
+CREDENTIALS = {'endpoint': OWNER[0], 'bucket': OWNER[1], 'access_key_id': OWNER[2], 'access_key_secret': 'sk'}
+
+
+def _wait_for_state(manager, job_id, state, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(OWNER, job_id)
+        if job['state'] == state:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {state}: {manager.get(OWNER, job_id)}")
+
+
+def test_pending_bytes_are_capped(monkeypatch):
+    monkeypatch.setenv(upload_jobs_module.MAX_PENDING_BYTES_ENV, '100')
+    manager = UploadJobManager()
+    release = threading.Event()
+
+    def blocked(progress):
+        release.wait(5)
+        return {'ok': True}
+
+    # 只有一个未结束的任务时不受限制
+    first = manager.submit(OWNER, 'a', 'url-a', 80, blocked)
+    with pytest.raises(ValueError, match='Too many bytes pending'):
+        manager.submit(OWNER, 'b', 'url-b', 30, blocked)
+    second = manager.submit(OWNER, 'c', 'url-c', 20, blocked)
+
+    release.set()
+    _wait_for_state(manager, first['job_id'], 'completed')
+    _wait_for_state(manager, second['job_id'], 'completed')
+    # 已结束的任务不再计入
+    third = manager.submit(OWNER, 'b', 'url-b', 30, lambda progress: None)
+    _wait_for_state(manager, third['job_id'], 'completed')
+
+
+def test_async_upload_reads_file_content_in_worker(monkeypatch):
+    manager = UploadJobManager()
+    monkeypatch.setattr('tools.upload_file.upload_jobs', manager)
+    monkeypatch.setattr('tools.upload_file.create_client', lambda *args, **kwargs: object())
+    uploaded = []
+
+    def fake_upload(client, credentials, key, content, content_type, max_retries, progress=None, crc64=None):
+        uploaded.append((key, content))
+        return {'status': 'verified'}, 'etag'
+
+    monkeypatch.setattr('tools.upload_file.upload_with_retries', fake_upload)
+    monkeypatch.setenv('TOS_IDEMPOTENCY_TTL', '0')
+
+    file = File(url='http://files.example/blob', filename='report.pdf', extension='.pdf', size=5, type='document')
+    release = threading.Event()
+
+    def blob(self):
+        release.wait(5)
+        return b'%PDF-'
+
+    tool = object.__new__(UploadFileTool)
+    tool.runtime = SimpleNamespace(credentials=CREDENTIALS)
+    with mock.patch.object(File, 'blob', property(blob)):
+        result = tool._upload_file({'file': file, 'directory': 'docs', 'async_mode': True}, CREDENTIALS)
+        # 提交任务时不读取文件内容
+        assert result['status'] == 'queued'
+        assert result['files'][0]['file_size_bytes'] == 5
+        assert uploaded == []
+
+        release.set()
+        job = _wait_for_state(manager, result['job_ids'][0], 'completed')
+
+    assert uploaded == [('docs/report.pdf', b'%PDF-')]
+    assert job['result']['file_size_bytes'] == 5
+    assert job['result']['integrity'] == {'status': 'verified'}
+
+
+def test_async_replay_reports_the_object_actually_written(monkeypatch):
+    from tools import idempotency
+
+    manager = UploadJobManager()
+    monkeypatch.setattr('tools.upload_file.upload_jobs', manager)
+    monkeypatch.setattr('tools.upload_file.create_client', lambda *args, **kwargs: object())
+    monkeypatch.setattr(idempotency, '_upload_cache', idempotency.IdempotencyCache())
+    uploaded = []
+
+    def fake_upload(client, credentials, key, content, content_type, max_retries, progress=None, crc64=None):
+        uploaded.append(key)
+        return {'status': 'verified'}, 'etag'
+
+    monkeypatch.setattr('tools.upload_file.upload_with_retries', fake_upload)
+    tool = object.__new__(UploadFileTool)
+    tool.runtime = SimpleNamespace(credentials=CREDENTIALS)
+    parameters = {'file': b'hello', 'directory': 'd', 'filename_mode': 'random'}
+
+    first = tool._upload_file(parameters, CREDENTIALS)['files'][0]
+    queued = tool._upload_file(dict(parameters, async_mode=True), CREDENTIALS)['files'][0]
+    # 提交任务时返回的对象键是预计的，复用之前的上传后并不会写入
+    assert queued['object_key'] != first['object_key']
+
+    job = _wait_for_state(manager, queued['job_id'], 'completed')
+
+    assert uploaded == [first['object_key']]
+    assert job['object_key'] == first['object_key']
+    assert job['file_url'] == first['file_url']
+    assert job['result']['idempotent_replay'] is True
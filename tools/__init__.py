@@ -1,5 +1,16 @@
+# 在导入任何工具之前应用一次性兼容性补丁（tos SDK 等较重的依赖在首次传输时才导入）
+from .bootstrap import apply_compat_patches
+apply_compat_patches()
+
 from .upload_file import UploadFileTool
 from .multi_upload_files import MultiUploadFilesTool
 from .get_file_by_url import GetFileByUrlTool
+from .delete_objects import DeleteObjectsTool
+from .select_object import SelectObjectTool
+from .put_text_object import PutTextObjectTool
+from .append_object import AppendObjectTool
+from .get_upload_status import GetUploadStatusTool
+from .copy_object import CopyObjectTool
+from .sync_to_prefix import SyncToPrefixTool
 
-__all__ = ['UploadFileTool', 'MultiUploadFilesTool', 'GetFileByUrlTool']
\ No newline at end of file
+__all__ = ['UploadFileTool', 'MultiUploadFilesTool', 'GetFileByUrlTool', 'DeleteObjectsTool', 'SelectObjectTool', 'PutTextObjectTool', 'AppendObjectTool', 'GetUploadStatusTool', 'CopyObjectTool', 'SyncToPrefixTool']
\ No newline at end of file
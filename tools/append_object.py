@@ -0,0 +1,177 @@
+import codecs
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Generator, Optional
+from urllib.parse import unquote_plus
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .utils import get_content_type_by_extension, parse_tos_url
+from .tos_client import create_client
+from .profiling import profiled
+
+# 追加位置缓存：按 (endpoint, bucket, object_key) 记录下一次追加的位置和当前CRC64，避免每次追加前都发起HEAD请求
+APPEND_POSITION_CACHE_SIZE = 1024
+_append_positions = OrderedDict()
+_append_positions_lock = threading.Lock()
+
+
+def _get_append_position(cache_key: tuple) -> Optional[tuple]:
+    with _append_positions_lock:
+        position = _append_positions.get(cache_key)
+        if position is not None:
+            _append_positions.move_to_end(cache_key)
+        return position
+
+
+def _set_append_position(cache_key: tuple, offset: int, crc64: Optional[int]) -> None:
+    with _append_positions_lock:
+        _append_positions[cache_key] = (offset, crc64)
+        _append_positions.move_to_end(cache_key)
+        while len(_append_positions) > APPEND_POSITION_CACHE_SIZE:
+            _append_positions.popitem(last=False)
+
+
+def _invalidate_append_position(cache_key: tuple) -> None:
+    with _append_positions_lock:
+        _append_positions.pop(cache_key, None)
+
+
+class AppendObjectTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 从运行时获取凭据并校验
+            credentials = self.runtime.credentials if self.runtime else {}
+            self._validate_credentials(credentials)
+
+            # 执行追加写操作（使用运行时凭据）
+            result = self._append(tool_parameters, credentials)
+
+            yield self.create_json_message(result)
+
+            # 生成详细的文本消息
+            text_message = "Append completed\n"
+            text_message += f"Object key: {result['object_key']}\n"
+            text_message += f"Appended: {result['appended_bytes']} bytes at offset {result['offset']}\n"
+            text_message += f"Object size: {result['object_size_bytes']} bytes\n"
+            text_message += f"File URL: {result['file_url']}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Failed to append object: {str(e)}")
+            # 同时抛出异常以保持原有行为
+            raise ValueError(f"Failed to append object: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _append(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        # 获取对象键、追加内容和其他参数
+        object_key = (parameters.get('object_key') or '').strip()
+        content = parameters.get('content')
+        encoding = (parameters.get('encoding') or 'utf-8').strip()
+        content_type = (parameters.get('content_type') or '').strip()
+        add_newline = bool(parameters.get('add_newline', False))
+
+        # 验证必填参数
+        if not object_key:
+            raise ValueError("Missing required parameter: object_key")
+        if content is None:
+            raise ValueError("Missing required parameter: content")
+        try:
+            encoding = codecs.lookup(encoding).name
+        except LookupError:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+        bucket = credentials['bucket']
+        # 支持直接传入对象URL
+        if object_key.startswith(('http://', 'https://')):
+            parsed_bucket, _, object_key = parse_tos_url(object_key)
+            object_key = unquote_plus(object_key)
+            if parsed_bucket != bucket:
+                raise ValueError(f"Object URL does not belong to the configured bucket: {bucket}")
+        if object_key.startswith(('/', '\\')):
+            raise ValueError("Object key cannot start with / or \\ ")
+
+        if add_newline and not content.endswith('\n'):
+            content += '\n'
+        body = content.encode(encoding)
+        if not body:
+            raise ValueError("Content to append cannot be empty")
+
+        # 首次追加时设置的内容类型
+        if not content_type:
+            _, extension = os.path.splitext(object_key)
+            content_type = get_content_type_by_extension(extension)
+
+        # 初始化TOS客户端
+        endpoint = credentials['endpoint']
+        client = create_client(credentials, request_timeout=int(parameters.get('request_timeout', 60)))
+
+        from tos.exceptions import TosServerError
+
+        cache_key = (endpoint, bucket, object_key)
+        position = _get_append_position(cache_key)
+        position_from_cache = position is not None
+        if position is None:
+            position = self._query_append_position(client, bucket, object_key)
+
+        try:
+            output = self._append_at(client, bucket, object_key, body, content_type, position)
+        except TosServerError as e:
+            # 缓存的位置已过期（例如对象被其他进程追加或重建），重新查询位置后重试一次
+            if not position_from_cache or e.status_code != 409:
+                _invalidate_append_position(cache_key)
+                raise
+            _invalidate_append_position(cache_key)
+            position = self._query_append_position(client, bucket, object_key)
+            output = self._append_at(client, bucket, object_key, body, content_type, position)
+
+        offset = position[0]
+        next_offset = output.next_append_offset if output.next_append_offset is not None else offset + len(body)
+        _set_append_position(cache_key, next_offset, output.hash_crc64_ecma)
+
+        return {
+            'status': 'completed',
+            'object_key': object_key,
+            'file_url': f"https://{bucket}.{endpoint}/{object_key}",
+            'content_type': content_type,
+            'offset': offset,
+            'appended_bytes': len(body),
+            'object_size_bytes': next_offset,
+            'next_append_offset': next_offset
+        }
+
+    def _append_at(self, client, bucket: str, object_key: str, body: bytes, content_type: str, position: tuple):
+        """在指定位置追加内容；对象不存在时（位置为0）同时设置内容类型"""
+        offset, crc64 = position
+        return client.append_object(
+            bucket=bucket,
+            key=object_key,
+            offset=offset,
+            content=body,
+            content_type=content_type if offset == 0 else None,
+            pre_hash_crc64_ecma=crc64
+        )
+
+    def _query_append_position(self, client, bucket: str, object_key: str) -> tuple:
+        """通过HEAD请求查询对象当前长度和CRC64，对象不存在时从0开始追加"""
+        from tos.exceptions import TosServerError
+
+        try:
+            head = client.head_object(bucket=bucket, key=object_key)
+        except TosServerError as e:
+            if e.status_code == 404:
+                return 0, 0
+            raise
+        if head.object_type and head.object_type != 'Appendable':
+            raise ValueError(f"Object {object_key} exists and is not appendable")
+        return head.content_length or 0, head.hash_crc64_ecma
@@ -0,0 +1,111 @@
+"""
+插件运行环境的一次性兼容性补丁
+
+- apply_compat_patches()：在 tools 包导入时执行，先做 gevent 的 monkey patch（需早于 socket/ssl 的使用），
+  再关闭SSL验证警告、取消pyOpenSSL注入并修补 urllib3 的SSL上下文构建，避免 RecursionError。
+  dify_plugin 本身已导入 requests/urllib3，因此这些补丁在导入时应用几乎没有额外开销，
+  且保证任何HTTP请求（包括读取 file.blob）之前补丁均已生效；
+- load_tos()：应用补丁后再导入 tos SDK，使插件冷启动时无需加载完整的SDK。
+
+所有函数均可重复调用，补丁只会应用一次。
+"""
+import ssl as _stdlib_ssl
+import threading
+
+_lock = threading.RLock()
+_compat_patched = False
+
+
+def apply_compat_patches() -> None:
+    """应用 gevent 的 monkey patch（ssl 除外）以及 requests/urllib3 的兼容性补丁"""
+    global _compat_patched
+    if _compat_patched:
+        return
+    with _lock:
+        if _compat_patched:
+            return
+        try:
+            from gevent import monkey as _gevent_monkey
+            _gevent_monkey.patch_all(ssl=False)
+        except Exception:
+            pass
+
+        # 禁用SSL验证警告
+        try:
+            import urllib3
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        except Exception:
+            pass
+
+        # 取消 requests 默认对 urllib3 的 pyOpenSSL 注入，避免 SSLContext.minimum_version 递归
+        try:
+            import requests  # 触发 requests 导入（其会注入 pyOpenSSL）
+            import urllib3.contrib.pyopenssl as pyopenssl
+            pyopenssl.extract_from_urllib3()
+        except Exception:
+            pass
+
+        try:
+            _patch_urllib3_ssl_context()
+        except Exception:
+            pass
+        _compat_patched = True
+
+
+def _patch_urllib3_ssl_context() -> None:
+    """兼容性补丁：避免 urllib3 在设置 context.minimum_version 时触发 RecursionError"""
+    import urllib3.util.ssl_ as _urllib3_ssl
+
+    original_create_context = _urllib3_ssl.create_urllib3_context
+
+    # 每次都构建新的上下文：urllib3 会针对每个连接修改上下文（verify_mode、check_hostname、CA证书），不能共享
+    def _safe_create_urllib3_context(*args, **kwargs):
+        try:
+            return original_create_context(*args, **kwargs)
+        except RecursionError:
+            ssl_version = kwargs.get("ssl_version")
+            ciphers = kwargs.get("ciphers")
+            cert_reqs = kwargs.get("cert_reqs")
+            options = kwargs.get("options")
+            cadata = kwargs.get("cadata")
+            protocol = ssl_version if isinstance(ssl_version, int) else (
+                _stdlib_ssl.PROTOCOL_TLS_CLIENT if hasattr(_stdlib_ssl, "PROTOCOL_TLS_CLIENT") else _stdlib_ssl.PROTOCOL_TLS
+            )
+            ctx = _stdlib_ssl.SSLContext(protocol)
+            if cert_reqs is not None:
+                try:
+                    ctx.verify_mode = cert_reqs
+                except Exception:
+                    pass
+            if options is not None:
+                try:
+                    ctx.options |= options
+                except Exception:
+                    pass
+            if ciphers is not None:
+                try:
+                    ctx.set_ciphers(ciphers)
+                except Exception:
+                    pass
+            if cadata is not None:
+                try:
+                    ctx.load_verify_locations(cadata=cadata)
+                except Exception:
+                    pass
+            return ctx
+
+    _urllib3_ssl.create_urllib3_context = _safe_create_urllib3_context
+
+    # 进一步确保调用方使用安全的 create_urllib3_context（覆盖 urllib3.connection 中的同名绑定）
+    try:
+        import urllib3.connection as _urllib3_conn
+        _urllib3_conn.create_urllib3_context = _safe_create_urllib3_context
+    except Exception:
+        pass
+
+
+def load_tos():
+    """应用兼容性补丁后导入并返回 tos 模块"""
+    apply_compat_patches()
+    import tos
+    return tos
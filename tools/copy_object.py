@@ -0,0 +1,226 @@
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Generator, List
+from urllib.parse import unquote_plus
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .utils import parse_tos_url
+from .tos_client import create_client
+from .profiling import profiled
+
+# 单次CopyObject请求支持的最大对象大小（5 GiB），超过时使用分片拷贝
+MAX_SINGLE_COPY_SIZE = 5 * 1024 * 1024 * 1024
+# 分片拷贝的最小分片大小及最大分片数
+MIN_COPY_PART_SIZE = 256 * 1024 * 1024
+MAX_COPY_PARTS = 10000
+# 单次调用最多处理的拷贝对数
+MAX_COPY_PAIRS = 100
+# 并发执行的拷贝对数量及每个对象并发拷贝的分片数量
+MAX_CONCURRENT_COPIES = 4
+MAX_CONCURRENT_PART_COPIES = 8
+
+
+class CopyObjectTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 从运行时获取凭据并校验
+            credentials = self.runtime.credentials if self.runtime else {}
+            self._validate_credentials(credentials)
+
+            # 执行服务端拷贝操作（使用运行时凭据）
+            result = self._copy_objects(tool_parameters, credentials)
+
+            yield self.create_json_message(result)
+
+            # 生成详细的文本消息
+            action = 'Move' if result.get('move') else 'Copy'
+            text_message = f"{action} completed\n"
+            text_message += f"Success: {result.get('success_count', 0)} objects\n"
+            text_message += f"Failed: {result.get('error_count', 0)} objects\n\n"
+            for item in result.get('objects', []):
+                text_message += f"- {item['source_key']} -> {item['destination_key']}\n"
+                if item.get('status') == 'success':
+                    text_message += f"  Size: {item.get('size_bytes', 0)} bytes ({item.get('method')})\n"
+                    text_message += f"  File URL: {item.get('file_url')}\n"
+                else:
+                    text_message += f"  Error: {item.get('error')}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Failed to copy objects: {str(e)}")
+            # 同时抛出异常以保持原有行为
+            raise ValueError(f"Failed to copy objects: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _copy_objects(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        # 获取拷贝对列表和移动模式参数
+        move = bool(parameters.get('move', False))
+        pairs = self._parse_pairs(parameters.get('pairs'), credentials)
+
+        # 验证必填参数
+        if not pairs:
+            raise ValueError("Missing required parameter: pairs")
+        if len(pairs) > MAX_COPY_PAIRS:
+            raise ValueError(f"Maximum number of copy pairs ({MAX_COPY_PAIRS}) exceeded")
+
+        # 初始化TOS客户端
+        client = create_client(credentials, request_timeout=int(parameters.get('request_timeout', 60)))
+
+        # 并发执行各拷贝对，单个拷贝对失败不影响其他拷贝对
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_COPIES, len(pairs))) as executor:
+            objects = list(executor.map(lambda pair: self._copy_pair(client, credentials, pair, move), pairs))
+
+        success_count = sum(1 for item in objects if item['status'] == 'success')
+        return {
+            'status': 'completed',
+            'move': move,
+            'success_count': success_count,
+            'error_count': len(objects) - success_count,
+            'objects': objects
+        }
+
+    def _copy_pair(self, client, credentials: dict[str, Any], pair: tuple, move: bool) -> dict:
+        """拷贝（或移动）单个对象，返回该对象的处理结果"""
+        src_bucket, src_key, dst_bucket, dst_key = pair
+        item = {
+            'source_bucket': src_bucket,
+            'source_key': src_key,
+            'destination_bucket': dst_bucket,
+            'destination_key': dst_key
+        }
+        try:
+            if (src_bucket, src_key) == (dst_bucket, dst_key):
+                raise ValueError("Source and destination are the same object")
+
+            from tos.enum import ACLType
+
+            head = client.head_object(bucket=src_bucket, key=src_key)
+            size = head.content_length or 0
+            # SDK的copy_object默认将目标对象的ACL设为private，拷贝前读取源对象的ACL，拷贝后原样设置
+            acl = client.get_object_acl(bucket=src_bucket, key=src_key)
+            acl_type = ACLType.ACL_Default if acl.is_default else None
+            if size <= MAX_SINGLE_COPY_SIZE:
+                # 单次拷贝沿用源对象的元数据，存储类型需显式指定
+                client.copy_object(bucket=dst_bucket, key=dst_key, src_bucket=src_bucket, src_key=src_key,
+                                   storage_class=head.storage_class, acl=acl_type)
+                item.update({'method': 'copy', 'parts': 1})
+            else:
+                parts = self._multipart_copy(client, src_bucket, src_key, dst_bucket, dst_key, size, head, acl_type)
+                item.update({'method': 'multipart_copy', 'parts': parts})
+            if not acl.is_default:
+                client.put_object_acl(bucket=dst_bucket, key=dst_key, owner=acl.owner, grants=acl.grants)
+
+            # 移动模式：拷贝成功后删除源对象
+            source_deleted = False
+            if move:
+                client.delete_object(bucket=src_bucket, key=src_key)
+                source_deleted = True
+
+            item.update({
+                'file_url': f"https://{dst_bucket}.{credentials['endpoint']}/{dst_key}",
+                'size_bytes': size,
+                'source_deleted': source_deleted,
+                'status': 'success'
+            })
+        except Exception as e:
+            item.update({'error': str(e), 'status': 'failed'})
+        return item
+
+    def _multipart_copy(self, client, src_bucket: str, src_key: str, dst_bucket: str, dst_key: str,
+                        size: int, head, acl_type) -> int:
+        """使用UploadPartCopy并发拷贝大对象的各个分片，返回分片数"""
+        from tos.models2 import UploadedPart
+
+        part_size = max(MIN_COPY_PART_SIZE, math.ceil(size / MAX_COPY_PARTS))
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+        # 分片拷贝不会沿用源对象的元数据，创建分片上传时从HEAD结果中逐项传入
+        upload = client.create_multipart_upload(
+            bucket=dst_bucket,
+            key=dst_key,
+            content_type=head.content_type,
+            cache_control=head.cache_control,
+            content_disposition=head.content_disposition or None,
+            content_encoding=head.content_encoding,
+            content_language=head.content_language,
+            expires=head.expires,
+            meta=head.meta or None,
+            storage_class=head.storage_class,
+            website_redirect_location=head.website_redirect_location,
+            acl=acl_type
+        )
+        upload_id = upload.upload_id
+
+        def copy_part(part: tuple) -> UploadedPart:
+            part_number, (range_start, range_end) = part
+            output = client.upload_part_copy(
+                bucket=dst_bucket,
+                key=dst_key,
+                upload_id=upload_id,
+                part_number=part_number,
+                src_bucket=src_bucket,
+                src_key=src_key,
+                copy_source_range_start=range_start,
+                copy_source_range_end=range_end
+            )
+            return UploadedPart(part_number, output.etag)
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_PART_COPIES, len(ranges))) as executor:
+                parts = list(executor.map(copy_part, enumerate(ranges, start=1)))
+            client.complete_multipart_upload(bucket=dst_bucket, key=dst_key, upload_id=upload_id, parts=parts)
+        except Exception:
+            # 拷贝失败时取消分片上传，避免残留未完成的分片
+            try:
+                client.abort_multipart_upload(bucket=dst_bucket, key=dst_key, upload_id=upload_id)
+            except Exception:
+                pass
+            raise
+        return len(parts)
+
+    def _parse_pairs(self, pairs: Any, credentials: dict[str, Any]) -> List[tuple]:
+        """
+        解析拷贝对参数
+
+        每行一个拷贝对，格式为 "源 -> 目标"，源和目标可以是对象键或URL；
+        目标以 / 结尾时视为目录，沿用源对象的文件名。
+        """
+        if not pairs:
+            return []
+        if isinstance(pairs, str):
+            pairs = [line for line in re.split(r'[\r\n]+', pairs) if line.strip()]
+        parsed = []
+        for line in pairs:
+            parts = [part.strip() for part in str(line).split('->')]
+            if len(parts) != 2 or not parts[0] or not parts[1]:
+                raise ValueError(f"Invalid copy pair, expected 'source -> destination': {line}")
+            src_bucket, src_key = self._resolve(parts[0], credentials)
+            dst_bucket, dst_key = self._resolve(parts[1], credentials)
+            if not src_key or src_key.endswith('/'):
+                raise ValueError(f"Source must be an object key: {parts[0]}")
+            if not dst_key or dst_key.endswith('/'):
+                dst_key = f"{dst_key}{src_key.rsplit('/', 1)[-1]}"
+            parsed.append((src_bucket, src_key, dst_bucket, dst_key))
+        return parsed
+
+    def _resolve(self, value: str, credentials: dict[str, Any]) -> tuple:
+        """将对象键或URL解析为 (bucket, key)；URL须位于同一endpoint，服务端拷贝不支持跨区域"""
+        if value.startswith(('http://', 'https://')):
+            bucket, endpoint, key = parse_tos_url(value)
+            if endpoint and endpoint != credentials['endpoint']:
+                raise ValueError(f"Cross-endpoint copy is not supported: {value}")
+            return bucket or credentials['bucket'], unquote_plus(key)
+        if value.startswith('\\'):
+            raise ValueError(f"Object key cannot start with \\ : {value}")
+        return credentials['bucket'], value.lstrip('/')
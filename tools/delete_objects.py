@@ -0,0 +1,183 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Generator, List
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .tos_client import create_client
+from .profiling import profiled
+
+# 单次批量删除请求最多包含的对象数（TOS DeleteMultiObjects接口限制）
+MAX_KEYS_PER_BATCH = 1000
+# 并发发送的批量删除请求数
+MAX_CONCURRENT_BATCHES = 4
+# dry-run模式下在结果中最多返回的对象键数量
+MAX_PREVIEW_KEYS = 1000
+
+
+def _delete_batch(client, bucket: str, batch: List[str]) -> List[dict]:
+    """删除一批对象，返回该批中删除失败的对象信息"""
+    from tos.models2 import ObjectTobeDeleted
+
+    try:
+        # quiet模式下响应中只包含删除失败的对象
+        output = client.delete_multi_objects(
+            bucket=bucket,
+            objects=[ObjectTobeDeleted(key=key) for key in batch],
+            quiet=True
+        )
+        return [{
+            'key': error.key,
+            'code': error.code,
+            'message': error.message
+        } for error in output.error]
+    except Exception as e:
+        # 整批请求失败时，将该批中的每个对象都记为失败
+        code = getattr(e, 'code', None) or type(e).__name__
+        message = getattr(e, 'message', None) or str(e)
+        return [{'key': key, 'code': code, 'message': message} for key in batch]
+
+
+def delete_keys(client, bucket: str, keys: List[str]) -> List[dict]:
+    """
+    按每批最多1000个对象切分，并发发送批量删除请求
+
+    Returns:
+        List[dict]: 删除失败的对象信息（key、code、message）
+    """
+    batches = [keys[i:i + MAX_KEYS_PER_BATCH] for i in range(0, len(keys), MAX_KEYS_PER_BATCH)]
+    errors = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(batches))) as executor:
+            for batch_errors in executor.map(lambda batch: _delete_batch(client, bucket, batch), batches):
+                errors.extend(batch_errors)
+    return errors
+
+
+class DeleteObjectsTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 从运行时获取凭据并校验
+            credentials = self.runtime.credentials if self.runtime else {}
+            self._validate_credentials(credentials)
+
+            # 执行批量删除操作（使用运行时凭据）
+            result = self._delete_objects(tool_parameters, credentials)
+
+            yield self.create_json_message(result)
+
+            # 生成详细的文本消息
+            if result.get('dry_run'):
+                text_message = "Dry run completed, no objects were deleted\n"
+                text_message += f"Matched: {result.get('matched_count', 0)} objects\n"
+                preview_keys = result.get('keys', [])
+                if preview_keys:
+                    text_message += "\nObjects that would be deleted:\n"
+                    for key in preview_keys:
+                        text_message += f"- {key}\n"
+                    if result.get('keys_truncated'):
+                        text_message += "- ...\n"
+            else:
+                text_message = "Batch delete completed\n"
+                text_message += f"Matched: {result.get('matched_count', 0)} objects\n"
+                text_message += f"Deleted: {result.get('deleted_count', 0)} objects\n"
+                text_message += f"Failed: {result.get('error_count', 0)} objects\n"
+                errors = result.get('errors', [])
+                if errors:
+                    text_message += "\nFailed objects:\n"
+                    for error in errors:
+                        text_message += f"- {error.get('key')}: {error.get('code')} {error.get('message')}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Failed to delete objects: {str(e)}")
+            # 同时抛出异常以保持原有行为
+            raise ValueError(f"Failed to delete objects: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _delete_objects(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        # 获取对象键列表、前缀和dry-run参数
+        keys = self._parse_keys(parameters.get('keys'))
+        prefix = (parameters.get('prefix') or '').strip()
+        dry_run = bool(parameters.get('dry_run', False))
+
+        # 验证必填参数：必须指定对象键或前缀，避免误删整个存储桶
+        if not keys and not prefix:
+            raise ValueError("Either 'keys' or a non-empty 'prefix' must be provided")
+        if prefix.startswith(('/', '\\')):
+            raise ValueError("Prefix cannot start with / or \\ ")
+
+        # 初始化TOS客户端
+        client = create_client(credentials, request_timeout=int(parameters.get('request_timeout', 60)))
+        bucket = credentials['bucket']
+
+        # 合并显式指定的对象键与前缀列举结果（去重并保持顺序）
+        target_keys = list(dict.fromkeys(keys))
+        if prefix:
+            seen = set(target_keys)
+            for key in self._list_keys(client, bucket, prefix):
+                if key not in seen:
+                    seen.add(key)
+                    target_keys.append(key)
+
+        if dry_run:
+            return {
+                'status': 'completed',
+                'dry_run': True,
+                'matched_count': len(target_keys),
+                'deleted_count': 0,
+                'error_count': 0,
+                'keys': target_keys[:MAX_PREVIEW_KEYS],
+                'keys_truncated': len(target_keys) > MAX_PREVIEW_KEYS,
+                'errors': []
+            }
+
+        errors = delete_keys(client, bucket, target_keys)
+
+        return {
+            'status': 'completed',
+            'dry_run': False,
+            'matched_count': len(target_keys),
+            'deleted_count': len(target_keys) - len(errors),
+            'error_count': len(errors),
+            'errors': errors
+        }
+
+    def _list_keys(self, client, bucket: str, prefix: str) -> Generator[str, None, None]:
+        """分页列举指定前缀下的所有对象键"""
+        continuation_token = None
+        while True:
+            output = client.list_objects_type2(
+                bucket=bucket,
+                prefix=prefix,
+                continuation_token=continuation_token,
+                max_keys=MAX_KEYS_PER_BATCH,
+                list_only_once=True
+            )
+            for obj in output.contents:
+                yield obj.key
+            if not output.is_truncated or not output.next_continuation_token:
+                break
+            continuation_token = output.next_continuation_token
+
+    def _parse_keys(self, keys: Any) -> List[str]:
+        """解析对象键参数，支持换行或逗号分隔的字符串以及列表"""
+        if not keys:
+            return []
+        if isinstance(keys, str):
+            keys = re.split(r'[\r\n,]+', keys)
+        parsed_keys = []
+        for key in keys:
+            key = str(key).strip().lstrip('/')
+            if key:
+                parsed_keys.append(key)
+        return parsed_keys
@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from .warmup import preconnect
+
+# 后台探测间隔（秒）
+PROBE_INTERVAL = 60
+# 延迟与失败率的指数移动平均系数
+EWMA_ALPHA = 0.3
+# 失败率对评分的惩罚系数：评分 = 平均延迟 * (1 + FAILURE_PENALTY * 失败率)
+FAILURE_PENALTY = 10
+# 探测失败时计入的延迟（秒）
+FAILED_PROBE_LATENCY = 5.0
+
+
+class _EndpointStats(object):
+    def __init__(self):
+        self.latency = None
+        self.failure_rate = 0.0
+        self.probes = 0
+
+    def record(self, latency: Optional[float]) -> None:
+        failed = latency is None
+        sample = FAILED_PROBE_LATENCY if failed else latency
+        if self.latency is None:
+            self.latency = sample
+            self.failure_rate = 1.0 if failed else 0.0
+        else:
+            self.latency = EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * self.latency
+            self.failure_rate = EWMA_ALPHA * (1.0 if failed else 0.0) + (1 - EWMA_ALPHA) * self.failure_rate
+        self.probes += 1
+
+    def score(self) -> Optional[float]:
+        if self.latency is None:
+            return None
+        return self.latency * (1 + FAILURE_PENALTY * self.failure_rate)
+
+
+class EndpointSelector(object):
+    """
+    在常规、内网及加速等多个候选访问域名之间按探测结果选择传输使用的域名
+
+    首次使用某组候选域名时在后台立即探测一次，之后每 PROBE_INTERVAL 秒重新探测；
+    在探测结果就绪之前始终使用主域名（凭据中的 endpoint）。
+
+    Args:
+        prober (callable): 探测函数 prober(host, port)，返回建连耗时（秒），失败时返回None；
+            默认为校验证书的 preconnect
+    """
+
+    def __init__(self, prober: Callable[[str, int], Optional[float]] = preconnect):
+        self._prober = prober
+        self._groups = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def select(self, bucket: str, primary: str, candidates: list) -> str:
+        endpoints = [primary] + [e for e in candidates if e and e != primary]
+        if len(endpoints) == 1:
+            return primary
+        group_key = (bucket, tuple(endpoints))
+        with self._lock:
+            is_new = group_key not in self._groups
+            if is_new:
+                self._groups[group_key] = time.time()
+                for endpoint in endpoints:
+                    self._stats.setdefault((bucket, endpoint), _EndpointStats())
+            scores = [(self._stats[(bucket, e)].score(), e) for e in endpoints]
+        if is_new:
+            threading.Thread(target=self._probe_group, args=group_key, name='tos-endpoint-probe', daemon=True).start()
+            self._ensure_probe_thread()
+
+        best_score, best_endpoint = None, primary
+        for score, endpoint in scores:
+            if score is not None and (best_score is None or score < best_score):
+                best_score, best_endpoint = score, endpoint
+        return best_endpoint
+
+    def snapshot(self) -> dict:
+        """返回各域名当前的探测统计，便于排查"""
+        with self._lock:
+            return {
+                f"{bucket}.{endpoint}": {
+                    'latency_ms': round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                    'failure_rate': round(stats.failure_rate, 3),
+                    'probes': stats.probes
+                }
+                for (bucket, endpoint), stats in self._stats.items()
+            }
+
+    def _probe_group(self, bucket: str, endpoints: tuple) -> None:
+        for endpoint in endpoints:
+            host = endpoint.split('://')[-1].split('/')[0]
+            port = 443
+            if ':' in host:
+                host, port = host.rsplit(':', 1)
+                port = int(port)
+            try:
+                latency = self._prober(f"{bucket}.{host}", port)
+            except Exception:
+                latency = None
+            with self._lock:
+                self._stats[(bucket, endpoint)].record(latency)
+
+    def _ensure_probe_thread(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._probe_loop, name='tos-endpoint-probe-loop', daemon=True)
+            self._thread.start()
+
+    def _probe_loop(self) -> None:
+        while True:
+            time.sleep(PROBE_INTERVAL)
+            with self._lock:
+                groups = list(self._groups.keys())
+            for bucket, endpoints in groups:
+                try:
+                    self._probe_group(bucket, endpoints)
+                except Exception:
+                    pass
+
+
+_selector = EndpointSelector()
+
+
+def parse_candidate_endpoints(value: Any) -> list:
+    """解析候选域名配置，支持逗号或换行分隔"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace('\n', ',').split(',')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def select_endpoint(credentials: dict[str, Any], endpoint: Optional[str] = None) -> str:
+    """
+    为一次传输选择访问域名
+
+    Args:
+        credentials (dict): 运行时凭据，可包含 candidate_endpoints
+        endpoint (str): 目标域名，默认为凭据中的 endpoint；与凭据中的 endpoint 不同时（例如URL指向其他区域）直接返回
+
+    Returns:
+        str: 传输使用的访问域名
+    """
+    primary = credentials.get('endpoint')
+    if endpoint and endpoint != primary:
+        return endpoint
+    candidates = parse_candidate_endpoints(credentials.get('candidate_endpoints'))
+    if not candidates:
+        return primary
+    return _selector.select(credentials.get('bucket', ''), primary, candidates)
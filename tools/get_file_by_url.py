@@ -1,95 +1,56 @@
-try:
-    from gevent import monkey as _gevent_monkey
-    _gevent_monkey.patch_all(ssl=False)
-except Exception:
-    pass
 import os
-import base64
-from typing import Any, Dict
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
 from collections.abc import Generator
+from urllib.parse import unquote_plus
 
-# 提前导入 dify_plugin（其内部会触发 gevent 的 monkey patch），避免在 urllib3/ssl 之后再 patch
+# 提前导入 dify_plugin（其内部会触发 gevent 的 monkey patch），兼容性补丁由 tools.bootstrap 统一应用
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-import tos
-from tos.auth import CredentialProviderAuth, StaticCredentialsProvider
-
-# 禁用SSL验证警告
-import urllib3
-from urllib.parse import unquote_plus
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# 取消 requests 默认对 urllib3 的 pyOpenSSL 注入，避免 SSLContext.minimum_version 递归
-try:
-    import requests  # 触发 requests 导入（其会注入 pyOpenSSL）
-    import urllib3.contrib.pyopenssl as pyopenssl
-    pyopenssl.extract_from_urllib3()
-except Exception:
-    pass
+from .utils import parse_tos_url
+from .tos_client import create_client
+from .transfer_scheduler import transfer_scheduler
+from .integrity import MAX_VERIFY_ATTEMPTS, ChecksumReader, content_report, download_report
+from .profiling import profiled
 
-# 兼容性补丁：避免 urllib3 在设置 context.minimum_version 时触发 RecursionError
-try:
-    import ssl as _stdlib_ssl
-    import urllib3.util.ssl_ as _urllib3_ssl
+# 图片处理支持的输出格式
+IMAGE_PROCESS_FORMATS = ('jpg', 'png', 'webp', 'bmp', 'gif', 'tiff', 'heic', 'avif')
+# 图片处理结果缓存：按 (bucket, object_key, ETag, 处理参数) 缓存服务端返回的处理结果
+IMAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+IMAGE_CACHE_MAX_ITEM_BYTES = 8 * 1024 * 1024
+_image_cache = OrderedDict()
+_image_cache_bytes = 0
+_image_cache_lock = threading.Lock()
 
-    _ORIG_CREATE_CTX = _urllib3_ssl.create_urllib3_context
 
-    def _safe_create_urllib3_context(*args, **kwargs):
-        try:
-            return _ORIG_CREATE_CTX(*args, **kwargs)
-        except RecursionError:
-            ssl_version = kwargs.get("ssl_version")
-            ciphers = kwargs.get("ciphers")
-            cert_reqs = kwargs.get("cert_reqs")
-            options = kwargs.get("options")
-            cadata = kwargs.get("cadata")
-            protocol = ssl_version if isinstance(ssl_version, int) else (
-                _stdlib_ssl.PROTOCOL_TLS_CLIENT if hasattr(_stdlib_ssl, "PROTOCOL_TLS_CLIENT") else _stdlib_ssl.PROTOCOL_TLS
-            )
-            ctx = _stdlib_ssl.SSLContext(protocol)
-            if cert_reqs is not None:
-                try:
-                    ctx.verify_mode = cert_reqs
-                except Exception:
-                    pass
-            if options is not None:
-                try:
-                    ctx.options |= options
-                except Exception:
-                    pass
-            if ciphers is not None:
-                try:
-                    ctx.set_ciphers(ciphers)
-                except Exception:
-                    pass
-            if cadata is not None:
-                try:
-                    ctx.load_verify_locations(cadata=cadata)
-                except Exception:
-                    pass
-            return ctx
+def _get_cached_image(cache_key: tuple):
+    with _image_cache_lock:
+        entry = _image_cache.get(cache_key)
+        if entry is not None:
+            _image_cache.move_to_end(cache_key)
+        return entry
 
-    _urllib3_ssl.create_urllib3_context = _safe_create_urllib3_context
-except Exception:
-    pass
 
-# 进一步确保调用方使用安全的 create_urllib3_context（覆盖 urllib3.connection 中的同名绑定）
-try:
-    import urllib3.connection as _urllib3_conn
-    _urllib3_conn.create_urllib3_context = _safe_create_urllib3_context
-except Exception:
-    pass
+def _put_cached_image(cache_key: tuple, content: bytes, content_type: str) -> None:
+    global _image_cache_bytes
+    if len(content) > IMAGE_CACHE_MAX_ITEM_BYTES:
+        return
+    with _image_cache_lock:
+        old_entry = _image_cache.pop(cache_key, None)
+        if old_entry is not None:
+            _image_cache_bytes -= len(old_entry[0])
+        _image_cache[cache_key] = (content, content_type)
+        _image_cache_bytes += len(content)
+        # 超出容量时按LRU淘汰
+        while _image_cache_bytes > IMAGE_CACHE_MAX_BYTES and _image_cache:
+            _, (evicted, _) = _image_cache.popitem(last=False)
+            _image_cache_bytes -= len(evicted)
 
-# 调试：验证补丁是否生效（已移除调试输出）
-try:
-    import inspect as _inspect
-    _util_is_safe = _urllib3_ssl.create_urllib3_context is _safe_create_urllib3_context
-    _conn_is_safe = getattr(_urllib3_conn, "create_urllib3_context", None) is _safe_create_urllib3_context
-except Exception:
-    pass
 
 class GetFileByUrlTool(Tool):
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage]:
         try:
             # 验证工具参数中的认证信息
@@ -103,26 +64,41 @@ class GetFileByUrlTool(Tool):
                 "files": [{
                     "file_name": result['filename'],
                     "file_size": result['file_size_bytes'],
-                    "mime_type": result['content_type']
+                    "mime_type": result['content_type'],
+                    "etag": result.get('etag'),
+                    "integrity": result.get('integrity')
                 }]
             })
             
-            # 返回BLOB消息
-            yield self.create_blob_message(
-                blob=file_content,
-                meta={
-                    "filename": result['filename'],
-                    "mime_type": result['content_type']
-                }
-            )
+            # 返回BLOB消息（head模式仅返回元信息，不包含文件内容）
+            if file_content is not None:
+                yield self.create_blob_message(
+                    blob=file_content,
+                    meta={
+                        "filename": result['filename'],
+                        "mime_type": result['content_type']
+                    }
+                )
             
             # 生成友好的文本消息
-            success_message = "File downloaded successfully!\n"
+            mode = result.get('mode', 'full')
+            if mode == 'head':
+                success_message = "File metadata retrieved successfully!\n"
+            elif mode == 'range':
+                success_message = "File range downloaded successfully!\n"
+            else:
+                success_message = "File downloaded successfully!\n"
             success_message += f"Filename: {result['filename']}\n"
             success_message += f"File type: {result.get('file_type', 'unknown')}\n"
             success_message += f"File size: {result['file_size']:.2f} MB\n"
+            if mode == 'range':
+                success_message += f"Range: {result.get('content_range') or result.get('range')}\n"
             success_message += f"Object key: {result['object_key']}\n"
             success_message += f"Content type: {result.get('content_type')}"
+            if result.get('etag'):
+                success_message += f"\nETag: {result['etag']}"
+            if result.get('integrity'):
+                success_message += f"\nCRC64: {result['integrity']['crc64']} ({result['integrity']['status']})"
             
             yield self.create_text_message(success_message)
         except Exception as e:
@@ -151,14 +127,9 @@ class GetFileByUrlTool(Tool):
             access_key_secret = credentials.get('access_key_secret')
             bucket = credentials.get('bucket')
             endpoint = credentials.get('endpoint')
-            region = credentials.get('region', '')
             enable_verify_ssl = credentials.get('enable_verify_ssl', False)
             
-            # 从endpoint中提取region
-            if '.' in endpoint:
-                region = endpoint.split('.')[0].replace('tos-', '')
-            else:
-                region = credentials.get('region', '')         # 验证认证信息
+            # 验证认证信息
             if not access_key_id or not access_key_secret or not bucket or not endpoint:
                 raise ValueError("Missing required credential: access_key_id, access_key_secret, bucket or endpoint")
             
@@ -171,43 +142,124 @@ class GetFileByUrlTool(Tool):
             if parsed_endpoint:
                 endpoint = parsed_endpoint
             
+            # 获取下载模式：full下载完整对象，head仅获取元信息，range仅下载指定字节范围
+            mode = (parameters.get('mode') or 'full').strip().lower()
+            if mode not in ('full', 'head', 'range'):
+                raise ValueError(f"Unsupported mode: {mode}")
+            byte_range = self._build_byte_range(parameters) if mode == 'range' else None
+            
+            # 生成图片处理参数（未指定时为None，按原样下载；仅full模式生效）
+            process = self._build_image_process(parameters) if mode == 'full' else None
+            
             # 创建TOS客户端
-            client = tos.TosClientV2(
-                ak=access_key_id,
-                sk=access_key_secret,
-                endpoint=endpoint,
-                region=region,
-                enable_verify_ssl=enable_verify_ssl,
-                request_timeout=30
-            )
+            client = create_client(credentials, endpoint, request_timeout=30, enable_verify_ssl=False, enable_crc=False)
             
             # 获取文件元信息
             file_content = None
             content_type = None
             file_size = 0
+            etag = None
+            content_range = None
+            # 完整下载时的CRC64校验结果（range/head模式及图片处理结果无法与对象的CRC64比对）
+            integrity = None
+            # 匿名回退下载时服务端是否忽略了Range头
+            range_ignored = False
             
             # 尝试使用TOS客户端下载
             try:
-                # 读取文件内容
-                response = client.get_object(bucket=bucket, key=object_key)
-                file_content = response.read()
-                file_size = len(file_content)
-                content_type = response.headers.get('Content-Type', 'application/octet-stream')
+                if mode == 'head':
+                    # 仅通过一次head_object获取元信息，不下载内容
+                    head = client.head_object(bucket=bucket, key=object_key)
+                    file_size = head.content_length or 0
+                    content_type = head.content_type or 'application/octet-stream'
+                    etag = head.etag
+                elif mode == 'range':
+                    # 仅下载指定的字节范围
+                    # 大下载先在共享调度器中获取通道再发起请求，排队期间不占用打开的连接
+                    response, _, file_content = transfer_scheduler.download(
+                        credentials,
+                        lambda options: client.get_object(bucket=bucket, key=object_key, range=byte_range, **options),
+                        size=self._range_size(byte_range))
+                    file_size = len(file_content)
+                    content_type = response.content_type or 'application/octet-stream'
+                    etag = response.etag
+                    content_range = response.content_range
+                elif process:
+                    # 服务端图片处理：先查询ETag，命中缓存时无需再次下载
+                    head = client.head_object(bucket=bucket, key=object_key)
+                    cache_key = (bucket, object_key, head.etag, process)
+                    cached = _get_cached_image(cache_key)
+                    if cached is not None:
+                        file_content, content_type = cached
+                    else:
+                        response, _, file_content = transfer_scheduler.download(
+                            credentials,
+                            lambda options: client.get_object(bucket=bucket, key=object_key, process=process, **options))
+                        content_type = response.content_type or 'application/octet-stream'
+                        _put_cached_image(cache_key, file_content, content_type)
+                    file_size = len(file_content)
+                    etag = head.etag
+                else:
+                    # 读取文件内容
+                    # 大对象经共享调度器排队并按租户限速读取，小对象直接读取；
+                    # 读取的同时计算CRC64并与服务端比对，不一致时重新下载
+                    for attempt in range(1, MAX_VERIFY_ATTEMPTS + 1):
+                        response, reader, file_content = transfer_scheduler.download(
+                            credentials,
+                            lambda options: client.get_object(bucket=bucket, key=object_key, **options),
+                            wrap=ChecksumReader)
+                        integrity = download_report(reader, response, retries=attempt - 1)
+                        if integrity['status'] != 'mismatch':
+                            break
+                    file_size = len(file_content)
+                    content_type = response.content_type or 'application/octet-stream'
+                    etag = response.etag
             except Exception as e:
                 # 回退：尝试匿名HTTP下载（适用于对象公有读或临时授权URL）
                 try:
                     import requests as _requests
-                    _resp = _requests.get(url, stream=True, verify=enable_verify_ssl, timeout=30)
-                    if _resp.status_code == 200:
-                        file_content = _resp.content
-                        file_size = int(_resp.headers.get('Content-Length', len(file_content)))
-                        content_type = _resp.headers.get('Content-Type', 'application/octet-stream')
+                    fallback_url = url
+                    if process:
+                        from urllib.parse import quote
+                        fallback_url += ('&' if '?' in url else '?') + 'x-tos-process=' + quote(process, safe='')
+                    if mode == 'head':
+                        _resp = _requests.head(fallback_url, verify=enable_verify_ssl, timeout=30)
+                        if _resp.status_code == 200:
+                            file_size = int(_resp.headers.get('Content-Length', 0))
+                            content_type = _resp.headers.get('Content-Type', 'application/octet-stream')
+                            etag = (_resp.headers.get('ETag') or '').strip('"') or None
+                        else:
+                            raise e
                     else:
-                        raise e
+                        _headers = {'Range': byte_range} if byte_range else None
+                        _resp = _requests.get(fallback_url, stream=True, verify=enable_verify_ssl, timeout=30,
+                                              headers=_headers)
+                        if byte_range and _resp.status_code == 200:
+                            # 服务端忽略了Range头并返回了完整对象，不能将其当作请求的范围返回
+                            _resp.close()
+                            range_ignored = True
+                        elif (not byte_range and _resp.status_code == 200) or (
+                                byte_range and _resp.status_code == 206 and _resp.headers.get('Content-Range')):
+                            file_content = _resp.content
+                            file_size = int(_resp.headers.get('Content-Length', len(file_content)))
+                            content_type = _resp.headers.get('Content-Type', 'application/octet-stream')
+                            etag = (_resp.headers.get('ETag') or '').strip('"') or None
+                            content_range = _resp.headers.get('Content-Range')
+                            if mode == 'full' and not process:
+                                integrity = content_report(file_content, _resp.headers.get('x-tos-hash-crc64ecma'))
+                        else:
+                            raise e
                 except Exception:
                     # 保持原始异常信息
                     raise e
             
+            if range_ignored:
+                raise ValueError(f"Range request was not honored by the server (expected 206 Partial Content): {byte_range}")
+            
+            if integrity and integrity['status'] == 'mismatch':
+                raise ValueError(f"CRC64 mismatch for {object_key}: local {integrity['crc64']}, "
+                                 f"server {integrity['server_crc64']}")
+            
             # 生成文件名
             filename = parameters.get('filename')
             if not filename:
@@ -216,6 +268,11 @@ class GetFileByUrlTool(Tool):
                 if not filename:
                     filename = "download"
             
+            # 图片格式转换后，使文件扩展名与输出格式保持一致
+            image_format = (parameters.get('format') or '').strip().lower()
+            if process and image_format:
+                filename = f"{os.path.splitext(filename)[0]}.{image_format}"
+            
             # 从内容类型或文件名推断文件类型
             file_type = 'unknown'
             _, extension = os.path.splitext(filename)
@@ -245,8 +302,14 @@ class GetFileByUrlTool(Tool):
                 "file_size": round(file_size_mb, 2),
                 "object_key": unquote_plus(object_key),
                 "content_type": content_type,
-                "file_size_bytes": file_size
+                "file_size_bytes": file_size,
+                "etag": etag,
+                "mode": mode,
+                "integrity": integrity
             }
+            if mode == 'range':
+                result["range"] = byte_range
+                result["content_range"] = content_range
             
             return result, file_content
         except Exception as e:
@@ -255,24 +318,60 @@ class GetFileByUrlTool(Tool):
             # 避免递归错误，直接抛出原始异常
             raise e
     
+    def _range_size(self, byte_range: str) -> Optional[int]:
+        """根据Range头计算下载的字节数，未指定结束位置时返回None"""
+        range_start, _, range_end = byte_range[len('bytes='):].partition('-')
+        return int(range_end) - int(range_start) + 1 if range_end else None
+
+    def _build_byte_range(self, parameters: dict[str, Any]) -> str:
+        """根据range_start/range_end参数生成HTTP Range头（range_end为闭区间，可省略表示读到末尾）"""
+        range_start = parameters.get('range_start')
+        range_end = parameters.get('range_end')
+        range_start = int(range_start) if range_start not in (None, '') else 0
+        if range_start < 0:
+            raise ValueError("range_start cannot be negative")
+        if range_end in (None, ''):
+            return f"bytes={range_start}-"
+        range_end = int(range_end)
+        if range_end < range_start:
+            raise ValueError("range_end cannot be less than range_start")
+        return f"bytes={range_start}-{range_end}"
+
+    def _build_image_process(self, parameters: dict[str, Any]) -> str | None:
+        """根据width/height/quality/format参数生成TOS图片处理参数（x-tos-process）"""
+        width = parameters.get('width')
+        height = parameters.get('height')
+        quality = parameters.get('quality')
+        image_format = (parameters.get('format') or '').strip().lower()
+
+        operations = []
+        resize_args = []
+        if width:
+            width = int(width)
+            if width <= 0:
+                raise ValueError("Width must be a positive integer")
+            resize_args.append(f"w_{width}")
+        if height:
+            height = int(height)
+            if height <= 0:
+                raise ValueError("Height must be a positive integer")
+            resize_args.append(f"h_{height}")
+        if resize_args:
+            operations.append("resize," + ",".join(resize_args))
+        if quality:
+            quality = int(quality)
+            if quality < 1 or quality > 100:
+                raise ValueError("Quality must be between 1 and 100")
+            operations.append(f"quality,q_{quality}")
+        if image_format:
+            if image_format not in IMAGE_PROCESS_FORMATS:
+                raise ValueError(f"Unsupported image format: {image_format}")
+            operations.append(f"format,{image_format}")
+
+        if not operations:
+            return None
+        return "image/" + "/".join(operations)
+
     def _parse_tos_url(self, url: str) -> tuple[str, str, str]:
         """解析TOS URL格式，提取bucket, endpoint和object_key"""
-        import re
-        # 尝试匹配TOS URL的多种格式
-        
-        # 格式1: https://bucket.endpoint/path/to/object
-        pattern1 = r'^https?://([^.]+)\.([^/]+)/(.*)$'
-        match1 = re.match(pattern1, url)
-        
-        if match1:
-            return match1.group(1), match1.group(2), match1.group(3)
-        
-        # 格式2: https://bucket.endpoint
-        pattern2 = r'^https?://([^.]+)\.([^/]+)$'
-        match2 = re.match(pattern2, url)
-        
-        if match2:
-            return match2.group(1), match2.group(2), ''
-        
-        # 如果以上格式都不匹配，抛出异常
-        raise ValueError(f"Invalid TOS URL format: {url}")
\ No newline at end of file
+        return parse_tos_url(url)
@@ -0,0 +1,74 @@
+import re
+from typing import Any, Generator, List
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .upload_jobs import upload_jobs, job_owner
+from .profiling import profiled
+
+
+class GetUploadStatusTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 从运行时获取凭据，任务仅对提交它的凭据可见
+            credentials = self.runtime.credentials if self.runtime else {}
+
+            # 查询后台上传任务状态
+            result = self._get_status(tool_parameters, credentials)
+
+            yield self.create_json_message(result)
+
+            # 生成详细的文本消息
+            text_message = "Upload status\n"
+            for job in result['jobs']:
+                text_message += f"- Job ID: {job['job_id']}\n"
+                text_message += f"  State: {job['state']}\n"
+                if job['state'] == 'not_found':
+                    continue
+                text_message += f"  Progress: {job['uploaded_bytes']}/{job['total_bytes']} bytes ({job['progress_percent']}%)\n"
+                text_message += f"  Throughput: {job['throughput_bytes_per_sec']} bytes/s\n"
+                text_message += f"  File URL: {job['file_url']}\n"
+                if job.get('error'):
+                    text_message += f"  Error: {job['error']}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Failed to get upload status: {str(e)}")
+            # 同时抛出异常以保持原有行为
+            raise ValueError(f"Failed to get upload status: {str(e)}")
+
+    def _get_status(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        # 获取任务ID列表
+        job_ids = self._parse_job_ids(parameters.get('job_id'))
+
+        # 验证必填参数
+        if not job_ids:
+            raise ValueError("Missing required parameter: job_id")
+
+        owner = job_owner(credentials)
+        jobs = []
+        for job_id in job_ids:
+            job = upload_jobs.get(owner, job_id)
+            # 任务不存在、已过期或属于其他凭据时统一返回not_found
+            jobs.append(job if job is not None else {'job_id': job_id, 'state': 'not_found'})
+
+        states = [job['state'] for job in jobs]
+        return {
+            'status': 'completed',
+            'all_finished': all(state in ('completed', 'failed', 'not_found') for state in states),
+            'completed_count': states.count('completed'),
+            'failed_count': states.count('failed'),
+            'pending_count': states.count('queued') + states.count('running'),
+            'jobs': jobs
+        }
+
+    def _parse_job_ids(self, job_ids: Any) -> List[str]:
+        """解析任务ID参数，支持换行或逗号分隔的字符串以及列表"""
+        if not job_ids:
+            return []
+        if isinstance(job_ids, str):
+            job_ids = re.split(r'[\r\n,\s]+', job_ids)
+        return list(dict.fromkeys(str(job_id).strip() for job_id in job_ids if str(job_id).strip()))
@@ -0,0 +1,143 @@
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+# 已完成上传结果的保留时间（秒），设置为0可关闭幂等缓存
+IDEMPOTENCY_TTL_ENV = 'TOS_IDEMPOTENCY_TTL'
+DEFAULT_IDEMPOTENCY_TTL = 600
+# 最多记录的上传数量（含进行中的上传）
+IDEMPOTENCY_CACHE_SIZE = 1024
+# 等待相同指纹的进行中上传的最长时间（秒），需小于 main.py 中的 MAX_REQUEST_TIMEOUT（120秒），
+# 否则等待中的调用会先被Dify终止
+IDEMPOTENCY_WAIT_TIMEOUT_ENV = 'TOS_IDEMPOTENCY_WAIT_TIMEOUT'
+DEFAULT_IDEMPOTENCY_WAIT_TIMEOUT = 90
+
+
+def _get_idempotency_ttl() -> int:
+    try:
+        return max(0, int(os.environ.get(IDEMPOTENCY_TTL_ENV, DEFAULT_IDEMPOTENCY_TTL)))
+    except ValueError:
+        return DEFAULT_IDEMPOTENCY_TTL
+
+
+def _get_wait_timeout() -> float:
+    try:
+        return max(0.0, float(os.environ.get(IDEMPOTENCY_WAIT_TIMEOUT_ENV, DEFAULT_IDEMPOTENCY_WAIT_TIMEOUT)))
+    except ValueError:
+        return DEFAULT_IDEMPOTENCY_WAIT_TIMEOUT
+
+
+class _Entry(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.expires_at = None
+
+
+class IdempotencyCache(object):
+    """
+    记录最近完成及正在进行中的上传，使Dify重试的调用复用之前的结果
+
+    相同指纹的调用：已完成且未过期时直接返回之前的结果；仍在进行中时最多等待 TOS_IDEMPOTENCY_WAIT_TIMEOUT 秒，
+    等到该上传完成后返回其结果；之前的上传失败时不缓存，由当前调用重新上传。
+    记录数达到上限且全部为进行中的上传时拒绝新的上传。
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_SIZE):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def run(self, fingerprint: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行（或复用）一次上传
+
+        Args:
+            fingerprint (str): 上传指纹，见 upload_fingerprint
+            func (callable): 实际执行上传并返回结果的函数
+
+        Returns:
+            tuple: (上传结果, 是否复用了之前的结果)
+        """
+        ttl = _get_idempotency_ttl()
+        if ttl <= 0:
+            return func(), False
+
+        while True:
+            with self._lock:
+                self._evict(time.time())
+                entry = self._entries.get(fingerprint)
+                if entry is None:
+                    if len(self._entries) >= self._max_entries:
+                        raise ValueError("Too many uploads in progress, please retry later")
+                    entry = _Entry()
+                    self._entries[fingerprint] = entry
+                    owner = True
+                else:
+                    self._entries.move_to_end(fingerprint)
+                    owner = False
+
+            if owner:
+                break
+            # 等待进行中的上传；失败时该记录会被移除，随后由当前调用接手
+            if not entry.done.wait(_get_wait_timeout()):
+                raise ValueError("An upload with the same content is still in progress, please retry later")
+            if entry.result is not None:
+                return copy.deepcopy(entry.result), True
+
+        try:
+            result = func()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(fingerprint) is entry:
+                    del self._entries[fingerprint]
+            entry.done.set()
+            raise
+
+        with self._lock:
+            entry.result = copy.deepcopy(result)
+            entry.expires_at = time.time() + ttl
+        entry.done.set()
+        return result, False
+
+    def _evict(self, now: float) -> None:
+        # 移除过期记录，并在达到容量时淘汰最久未使用的已完成记录；进行中的记录保留，由 run 拒绝新的上传
+        for key in [k for k, e in self._entries.items() if e.expires_at is not None and e.expires_at <= now]:
+            del self._entries[key]
+        if len(self._entries) >= self._max_entries:
+            for key in [k for k, e in self._entries.items() if e.expires_at is not None]:
+                del self._entries[key]
+                if len(self._entries) < self._max_entries:
+                    break
+
+
+_upload_cache = IdempotencyCache()
+
+
+def upload_fingerprint(content: bytes, credentials: dict[str, Any], **params: Optional[str]) -> str:
+    """
+    根据文件内容、目标存储桶和上传参数计算上传指纹
+
+    Args:
+        content (bytes): 文件内容
+        credentials (dict): 运行时凭据（使用其中的 endpoint 和 bucket）
+        **params: 影响对象键或内容类型的上传参数（目录、文件名、文件名模式等）
+
+    Returns:
+        str: 十六进制指纹
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{credentials.get('endpoint')}\n{credentials.get('bucket')}\n".encode('utf-8'))
+    for name in sorted(params):
+        digest.update(f"{name}={params[name] if params[name] is not None else ''}\n".encode('utf-8'))
+    digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def run_idempotent_upload(fingerprint: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+    """使用进程内共享的上传缓存执行上传，参见 IdempotencyCache.run"""
+    return _upload_cache.run(fingerprint, func)
@@ -0,0 +1,316 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from .transfer_scheduler import transfer_scheduler
+
+# 计算CRC64时每次处理的块大小
+CRC_CHUNK_SIZE = 1024 * 1024
+# 超过该大小的上传改用分片上传，逐个分片校验CRC64，校验失败时只重传对应分片
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MIN_PART_SIZE = 16 * 1024 * 1024
+MAX_PARTS = 10000
+MAX_CONCURRENT_PARTS = 4
+# 单个分片（或单次下载）在CRC64不一致时的最大尝试次数
+MAX_VERIFY_ATTEMPTS = 3
+# 整个上传失败后重试的最大退避时间（秒）
+MAX_RETRY_DELAY = 8.0
+
+ALGORITHM = 'crc64ecma'
+
+
+def _new_crc64():
+    from tos.utils import Crc64
+    return Crc64()
+
+
+def crc64(data: bytes) -> int:
+    """按块计算数据的CRC64（ECMA），避免为大数据构造切片副本"""
+    crc = _new_crc64()
+    view = memoryview(data)
+    for offset in range(0, len(view), CRC_CHUNK_SIZE):
+        crc.update(view[offset:offset + CRC_CHUNK_SIZE])
+    return crc.crc
+
+
+def combine_crc64(crc1: int, crc2: int, len2: int) -> int:
+    """合并两段连续数据的CRC64，len2为第二段数据的长度"""
+    return _new_crc64().combine(crc1, crc2, len2)
+
+
+def _server_crc64(output) -> Optional[int]:
+    value = getattr(output, 'hash_crc64_ecma', None)
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def _report(local: int, server: Optional[int], **extra) -> dict:
+    report = {
+        'algorithm': ALGORITHM,
+        'crc64': str(local),
+        'server_crc64': str(server) if server is not None else None,
+        # 服务端未返回CRC64时无法比对，标记为unverified
+        'status': 'verified' if server is not None else 'unverified'
+    }
+    report.update(extra)
+    return report
+
+
+class ChecksumReader(object):
+    """包装下载响应或上传内容：在内容被读取的同时增量计算CRC64，无需再次遍历数据"""
+
+    def __init__(self, response):
+        self._response = response
+        self._crc = _new_crc64()
+        self.bytes_read = 0
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        chunk = self._response.read(amt) if amt is not None else self._response.read()
+        if chunk:
+            self._crc.update(chunk)
+            self.bytes_read += len(chunk)
+        return chunk
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """SDK重试上传时回到内容开头重新发送，CRC64随之重新计算（只支持回到开头）"""
+        if offset != 0 or whence != os.SEEK_SET:
+            raise ValueError("ChecksumReader can only seek to the beginning")
+        self._response.seek(0)
+        self._crc = _new_crc64()
+        self.bytes_read = 0
+        return 0
+
+    @property
+    def crc64(self) -> int:
+        return self._crc.crc
+
+
+class _MemoryReader(object):
+    """以文件方式按块读取内存中的内容（或其切片），不构造完整副本"""
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._offset = 0
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        end = len(self._view) if amt is None or amt < 0 else min(len(self._view), self._offset + amt)
+        chunk = self._view[self._offset:end].tobytes()
+        self._offset = end
+        return chunk
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence != os.SEEK_SET:
+            raise ValueError("Only absolute seek is supported")
+        self._offset = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._offset
+
+
+def _upload_body(data, checksum: bool = True) -> tuple:
+    """
+    构造上传请求体：按块读取内容，需要时在发送的同时计算CRC64
+
+    Returns:
+        tuple: (ChecksumReader或None, 传给 put_object/upload_part 的 content)
+    """
+    from tos.utils import SizeAdapter
+
+    reader = ChecksumReader(_MemoryReader(data)) if checksum else None
+    # SizeAdapter 使SDK在请求内重试时回到开头重新发送（并重新计算CRC64）
+    body = SizeAdapter(reader or _MemoryReader(data), len(data), init_offset=0, can_reset=True)
+    return reader, body
+
+
+def download_report(reader: ChecksumReader, response, retries: int = 0) -> dict:
+    """比对下载内容与服务端返回的CRC64，内容不一致时状态为mismatch"""
+    server = _server_crc64(response)
+    report = _report(reader.crc64, server, retries=retries)
+    if server is not None and server != reader.crc64:
+        report['status'] = 'mismatch'
+    return report
+
+
+def content_report(content: bytes, server_value: Any) -> dict:
+    """比对已读取的内容与服务端CRC64响应头（用于无法包装读取过程的HTTP回退下载）"""
+    local = crc64(content)
+    server = int(server_value) if server_value not in (None, '') else None
+    report = _report(local, server, retries=0)
+    if server is not None and server != local:
+        report['status'] = 'mismatch'
+    return report
+
+
+class _PartProgress(object):
+    """将各分片的 data_transfer_listener 回调汇总为整个对象的上传进度"""
+
+    def __init__(self, listener: Callable, total_bytes: int):
+        self._listener = listener
+        self._total_bytes = total_bytes
+        self._consumed = {}
+        self._lock = threading.Lock()
+
+    def for_part(self, part_number: int) -> Callable:
+        def on_progress(consumed_bytes: int, total_bytes: int, rw_once_bytes: int, type: Any = None) -> None:
+            with self._lock:
+                self._consumed[part_number] = consumed_bytes
+                consumed = sum(self._consumed.values())
+            self._listener(consumed, self._total_bytes, rw_once_bytes, type)
+        return on_progress
+
+
+class VerifiedUpload(object):
+    """
+    带端到端CRC64校验的上传
+
+    本地CRC64在内容发送的同时（分片上传时按分片）增量计算，并在重试间复用；调用方已计算过CRC64时
+    （例如增量同步比对差异时）可通过 crc64 传入，不再重复计算。结果与服务端返回的 x-tos-hash-crc64ecma 比对；
+    分片上传时只重传CRC64不一致的分片，完成后将各分片的CRC64合并，再与整个对象的CRC64比对。
+    调用方创建客户端时应关闭SDK自带的CRC校验（enable_crc=False），避免重复计算。
+    """
+
+    def __init__(self, client, bucket: str, key: str, content: bytes, content_type: str,
+                 crc64: Optional[int] = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.content = content
+        self.content_type = content_type
+        self._crc = crc64
+        self._part_crcs = {}
+        # 上传成功后服务端返回的ETag
+        self.etag = None
+
+    def run(self, progress: Optional[Callable] = None, **options) -> dict:
+        """
+        执行一次上传，CRC64不一致时抛出ValueError
+
+        Args:
+            progress (callable): data_transfer_listener 回调
+            options: 传给 put_object/upload_part 的其他参数（rate_limiter、traffic_limit）
+
+        Returns:
+            dict: 校验结果
+        """
+        if len(self.content) > MULTIPART_THRESHOLD:
+            return self._multipart_upload(progress, options)
+
+        reader, body = _upload_body(self.content, checksum=self._crc is None)
+        output = self.client.put_object(
+            bucket=self.bucket,
+            key=self.key,
+            content=body,
+            content_type=self.content_type,
+            data_transfer_listener=progress,
+            **options
+        )
+        if reader is not None:
+            self._crc = reader.crc64
+        server = _server_crc64(output)
+        if server is not None and server != self._crc:
+            raise ValueError(f"CRC64 mismatch for {self.key}: local {self._crc}, server {server}")
+        self.etag = output.etag
+        return _report(self._crc, server, parts=1, retried_parts=[])
+
+    def _multipart_upload(self, progress: Optional[Callable], options: dict) -> dict:
+        from tos.models2 import UploadedPart
+
+        size = len(self.content)
+        part_size = max(MIN_PART_SIZE, math.ceil(size / MAX_PARTS))
+        ranges = [(start, min(start + part_size, size)) for start in range(0, size, part_size)]
+        view = memoryview(self.content)
+        part_progress = _PartProgress(progress, size) if progress else None
+        retried_parts = []
+
+        upload = self.client.create_multipart_upload(bucket=self.bucket, key=self.key,
+                                                     content_type=self.content_type)
+        upload_id = upload.upload_id
+
+        def upload_part(part: tuple) -> tuple:
+            part_number, (start, end) = part
+            for attempt in range(1, MAX_VERIFY_ATTEMPTS + 1):
+                # 直接读取 memoryview 切片，不复制分片内容；首次发送时计算该分片的CRC64
+                local = self._part_crcs.get(part_number)
+                reader, body = _upload_body(view[start:end], checksum=local is None)
+                output = self.client.upload_part(
+                    bucket=self.bucket,
+                    key=self.key,
+                    upload_id=upload_id,
+                    part_number=part_number,
+                    content=body,
+                    data_transfer_listener=part_progress.for_part(part_number) if part_progress else None,
+                    **options
+                )
+                if reader is not None:
+                    local = self._part_crcs[part_number] = reader.crc64
+                server = _server_crc64(output)
+                if server is None or server == local:
+                    return UploadedPart(part_number, output.etag), local, end - start
+                # 只重传CRC64不一致的分片
+                retried_parts.append(part_number)
+                if attempt == MAX_VERIFY_ATTEMPTS:
+                    raise ValueError(f"CRC64 mismatch for part {part_number} of {self.key}: "
+                                     f"local {local}, server {server}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_PARTS, len(ranges))) as executor:
+                results = list(executor.map(upload_part, enumerate(ranges, start=1)))
+            output = self.client.complete_multipart_upload(bucket=self.bucket, key=self.key, upload_id=upload_id,
+                                                           parts=[part for part, _, _ in results])
+        except Exception:
+            # 上传失败时取消分片上传，避免残留未完成的分片
+            try:
+                self.client.abort_multipart_upload(bucket=self.bucket, key=self.key, upload_id=upload_id)
+            except Exception:
+                pass
+            raise
+
+        # 合并各分片的CRC64，得到整个对象的CRC64
+        combined = results[0][1]
+        for _, part_crc, part_length in results[1:]:
+            combined = combine_crc64(combined, part_crc, part_length)
+        if self._crc is not None and self._crc != combined:
+            raise ValueError(f"CRC64 mismatch for {self.key}: content changed during upload")
+        self._crc = combined
+        server = _server_crc64(output)
+        if server is not None and server != combined:
+            raise ValueError(f"CRC64 mismatch for {self.key}: local {combined}, server {server}")
+        self.etag = output.etag
+        return _report(combined, server, parts=len(results), retried_parts=sorted(set(retried_parts)))
+
+
+def upload_with_retries(client, credentials: dict[str, Any], key: str, content: bytes, content_type: str,
+                        max_retries: int = 3, progress: Optional[Callable] = None,
+                        crc64: Optional[int] = None) -> tuple[dict, str]:
+    """
+    带CRC64校验的上传：经共享调度器执行（大文件排队并按租户限速，小文件直接上传），
+    失败时按指数退避重试，本地CRC64在重试间复用
+
+    Args:
+        client: TOS客户端（应关闭SDK自带的CRC校验）
+        credentials (dict): 运行时凭据
+        key (str): 对象键
+        content (bytes): 上传内容
+        content_type (str): 内容类型
+        max_retries (int): 最大尝试次数
+        progress (callable): data_transfer_listener 回调
+        crc64 (int): 已计算的内容CRC64，未知时为None
+
+    Returns:
+        tuple: (校验结果, 服务端返回的ETag)；全部尝试失败时抛出最后一次的异常
+    """
+    upload = VerifiedUpload(client, credentials['bucket'], key, content, content_type, crc64=crc64)
+    for attempt in range(1, max(1, max_retries) + 1):
+        try:
+            with transfer_scheduler.transfer(credentials, len(content)) as transfer_options:
+                report = upload.run(progress, **transfer_options)
+            return report, upload.etag
+        except Exception:
+            if attempt >= max_retries:
+                raise
+            time.sleep(min(MAX_RETRY_DELAY, 2 ** (attempt - 1)))
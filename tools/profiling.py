@@ -0,0 +1,128 @@
+import cProfile
+import functools
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Generator
+
+from .tos_client import create_client
+
+logger = logging.getLogger(__name__)
+
+# 未配置上传前缀时，性能分析结果保存到的本地目录
+PROFILE_DIR_ENV = 'TOS_PROFILE_DIR'
+DEFAULT_PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'tos-plugin-profiles')
+
+# 同一时间只分析一个调用：Python 3.12起 cProfile 基于整个解释器共享的 sys.monitoring，
+# 已有分析器运行时再次 enable() 会抛出 ValueError
+_profile_lock = threading.Lock()
+
+
+def _is_enabled(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+    return bool(value)
+
+
+def _profile_location(tool_name: str, credentials: dict[str, Any]) -> dict:
+    """预先确定分析结果的保存位置，以便在调用过程中写入JSON结果"""
+    filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{tool_name}-{uuid.uuid4().hex[:8]}.pstats"
+    prefix = (credentials.get('profile_prefix') or '').strip().strip('/')
+    if prefix:
+        object_key = f"{prefix}/{filename}"
+        return {
+            'format': 'pstats',
+            'storage': 'tos',
+            'object_key': object_key,
+            'file_url': f"https://{credentials['bucket']}.{credentials['endpoint']}/{object_key}"
+        }
+    return {
+        'format': 'pstats',
+        'storage': 'local',
+        'path': os.path.join(os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR), filename)
+    }
+
+
+def _save_profile(profiler: cProfile.Profile, location: dict, credentials: dict[str, Any]) -> None:
+    if location['storage'] == 'local':
+        os.makedirs(os.path.dirname(location['path']), exist_ok=True)
+        pstats.Stats(profiler).dump_stats(location['path'])
+        return
+
+    # 上传到配置的调试前缀
+    fd, path = tempfile.mkstemp(suffix='.pstats')
+    os.close(fd)
+    try:
+        pstats.Stats(profiler).dump_stats(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+    finally:
+        os.remove(path)
+
+    client = create_client(credentials, request_timeout=30)
+    client.put_object(
+        bucket=credentials['bucket'],
+        key=location['object_key'],
+        content=content,
+        content_type='application/octet-stream'
+    )
+
+
+def _with_profile_info(messages: Generator, info: dict) -> Generator:
+    """在JSON结果的 profile 字段中记录分析结果的保存位置（或跳过分析的原因）"""
+    for message in messages:
+        json_object = getattr(getattr(message, 'message', None), 'json_object', None)
+        if isinstance(json_object, dict):
+            json_object['profile'] = info
+        yield message
+
+
+def profiled(invoke: Callable[..., Generator]) -> Callable[..., Generator]:
+    """
+    工具 _invoke 的装饰器：凭据中开启 enable_profiling 时，使用 cProfile 记录整个调用
+
+    分析覆盖生成器从开始到结束期间当前线程的全部执行（包括调用方在两次yield之间对消息的处理），
+    结果以pstats格式保存到本地目录或上传到 profile_prefix 指定的前缀，保存位置写入JSON结果的 profile 字段。
+    已有其他调用正在分析时，本次调用不做分析，profile 字段为 {"status": "skipped"}。
+    未开启时直接调用原函数，没有额外开销。
+    """
+    @functools.wraps(invoke)
+    def wrapper(self, tool_parameters: dict[str, Any]) -> Generator:
+        credentials = self.runtime.credentials if self.runtime else {}
+        if not credentials or not _is_enabled(credentials.get('enable_profiling')):
+            yield from invoke(self, tool_parameters)
+            return
+
+        location = _profile_location(type(self).__name__, credentials)
+        profiler = None
+        if _profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 插件之外的分析器（如调试器）已在运行
+                _profile_lock.release()
+                profiler = None
+        if profiler is None:
+            yield from _with_profile_info(invoke(self, tool_parameters), {
+                'status': 'skipped',
+                'reason': 'Another profiling session is already active'
+            })
+            return
+
+        try:
+            yield from _with_profile_info(invoke(self, tool_parameters), location)
+        finally:
+            profiler.disable()
+            _profile_lock.release()
+            try:
+                _save_profile(profiler, location, credentials)
+            except Exception as e:
+                # 保存失败不影响工具调用结果
+                logger.warning("Failed to save profile to %s: %s", location.get('path') or location.get('object_key'), e)
+
+    return wrapper
@@ -0,0 +1,145 @@
+import codecs
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Generator
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .utils import get_content_type_by_extension, build_full_directory, build_object_key
+from .tos_client import create_client
+from .integrity import upload_with_retries
+from .profiling import profiled
+
+# 未指定文件名时根据内容类型选择扩展名
+CONTENT_TYPE_EXTENSIONS = {
+    'text/plain': '.txt',
+    'application/json': '.json',
+    'text/markdown': '.md',
+    'text/csv': '.csv',
+    'text/html': '.html',
+    'application/xml': '.xml',
+}
+
+
+class PutTextObjectTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 从运行时获取凭据并校验
+            credentials = self.runtime.credentials if self.runtime else {}
+            self._validate_credentials(credentials)
+
+            # 执行文本上传操作（使用运行时凭据）
+            result = self._put_text(tool_parameters, credentials)
+
+            yield self.create_json_message(result)
+
+            # 生成详细的文本消息
+            file_info = result['files'][0]
+            text_message = "Text upload completed\n"
+            text_message += f"- File name: {file_info.get('filename')}\n"
+            text_message += f"  File size: {file_info.get('file_size_bytes', 0)} bytes\n"
+            text_message += f"  Content type: {file_info.get('content_type')}\n"
+            text_message += f"  File URL: {file_info.get('file_url')}\n"
+            if file_info.get('integrity'):
+                text_message += f"  CRC64: {file_info['integrity']['crc64']} ({file_info['integrity']['status']})\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Failed to upload text: {str(e)}")
+            # 同时抛出异常以保持原有行为
+            raise ValueError(f"Failed to upload text: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _put_text(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        # 获取文本内容、目录和其他参数
+        content = parameters.get('content')
+        directory = parameters.get('directory', '')
+        directory_mode = parameters.get('directory_mode', 'no_subdirectory')
+        filename = parameters.get('filename')
+        filename_mode = parameters.get('filename_mode', 'filename')
+        encoding = (parameters.get('encoding') or 'utf-8').strip()
+        content_type = (parameters.get('content_type') or '').strip()
+
+        # 验证必填参数（允许上传空字符串）
+        if content is None:
+            raise ValueError("Missing required parameter: content")
+        try:
+            encoding = codecs.lookup(encoding).name
+        except LookupError:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+        # 对directory进行前后去空格处理并允许为空（表示根目录）
+        if directory is None:
+            directory = ''
+        directory = directory.strip()
+        if directory and directory.startswith(('/', '\\')):
+            raise ValueError("Directory cannot start with space, / or \\ ")
+
+        # 生成文件名：未指定时使用随机文件名，扩展名由内容类型决定
+        if filename:
+            filename = filename.strip()
+            if filename.startswith(('/', '\\')):
+                raise ValueError("Filename cannot start with space, / or \\ ")
+        # 与 upload_file 一致：用户指定的文件名优先，随机文件名只在未指定文件名时使用
+        if not filename:
+            extension = CONTENT_TYPE_EXTENSIONS.get(content_type, '.txt')
+            filename = f"{uuid.uuid4()}{extension}"
+
+        # 处理目录路径并生成对象键（与upload_file规则一致）
+        current_date = datetime.now()
+        full_directory = build_full_directory(directory, directory_mode, current_date)
+        final_filename, object_key = build_object_key(full_directory, filename, filename_mode, current_date)
+
+        # 确定内容类型：未指定时根据扩展名推断，文本类型附带字符集
+        _, extension = os.path.splitext(final_filename)
+        if not content_type:
+            content_type = get_content_type_by_extension(extension)
+        if 'charset=' not in content_type and (content_type.startswith('text/') or content_type in (
+                'application/json', 'application/xml', 'application/javascript')):
+            content_type = f"{content_type}; charset={encoding}"
+
+        # 直接编码文本内容，无需经过Dify文件中转
+        body = content.encode(encoding)
+
+        # 初始化TOS客户端
+        client = create_client(credentials, request_timeout=int(parameters.get('request_timeout', 60)),
+                               enable_crc=False)
+
+        # 上传文本（增加重试与指数退避），并校验CRC64
+        try:
+            integrity, _ = upload_with_retries(client, credentials, object_key, body, content_type,
+                                               int(parameters.get('max_retries', 3)))
+        except Exception as e:
+            raise ValueError(f"Failed to upload text: {str(e)}")
+
+        # 构造文件访问URL
+        file_url = f"https://{credentials['bucket']}.{credentials['endpoint']}/{object_key}"
+        file_size_bytes = len(body)
+
+        return {
+            'status': 'completed',
+            'success_count': 1,
+            'error_count': 0,
+            'files': [{
+                'filename': final_filename,
+                'object_key': object_key,
+                'file_url': file_url,
+                'content_type': content_type,
+                'encoding': encoding,
+                'file_size_bytes': file_size_bytes,
+                'file_size_mb': round(file_size_bytes / (1024 * 1024), 2),
+                'file_type': extension.lstrip('.') if extension else 'unknown',
+                'integrity': integrity,
+                'status': 'success'
+            }]
+        }
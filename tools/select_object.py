@@ -0,0 +1,276 @@
+import base64
+import json
+import re
+import struct
+import zlib
+from typing import Any, Callable, Generator, Iterator, Tuple
+from urllib.parse import unquote_plus
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+from .utils import parse_tos_url
+from .tos_client import create_client
+from .profiling import profiled
+
+# 查询结果默认及最大返回字节数
+DEFAULT_MAX_RESULT_BYTES = 1024 * 1024
+MAX_RESULT_BYTES_LIMIT = 10 * 1024 * 1024
+# 流式读取查询结果的块大小
+SELECT_CHUNK_SIZE = 64 * 1024
+# 查询结果按事件流分帧：总长度(4B)、头部长度(4B)、前导CRC32(4B)、头部、负载、消息CRC32(4B)
+PRELUDE_LENGTH = 12
+MESSAGE_CRC_LENGTH = 4
+# 事件头部取值类型对应的定长字节数（0/1为bool，无取值；6/7为2字节长度前缀的字节串/字符串）
+_HEADER_VALUE_SIZES = {2: 1, 3: 2, 4: 4, 5: 8, 8: 8, 9: 16}
+
+
+class _FrameBuffer(object):
+    """从响应中按需读取指定字节数"""
+
+    def __init__(self, read: Callable[[int], bytes]):
+        self._read = read
+        self._buffer = bytearray()
+
+    def read_exact(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            chunk = self._read(SELECT_CHUNK_SIZE)
+            if not chunk:
+                break
+            self._buffer += chunk
+        if len(self._buffer) < size:
+            if self._buffer:
+                raise ValueError("Select response ended in the middle of a frame")
+            return b''
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def _parse_event_headers(data: bytes) -> dict:
+    headers = {}
+    offset = 0
+    while offset < len(data):
+        name_length = data[offset]
+        name = data[offset + 1:offset + 1 + name_length].decode('utf-8')
+        offset += 1 + name_length
+        value_type = data[offset]
+        offset += 1
+        if value_type in (6, 7):
+            value_length = struct.unpack('>H', data[offset:offset + 2])[0]
+            value = data[offset + 2:offset + 2 + value_length]
+            headers[name] = value.decode('utf-8') if value_type == 7 else value
+            offset += 2 + value_length
+        elif value_type in (0, 1):
+            headers[name] = value_type == 0
+        elif value_type in _HEADER_VALUE_SIZES:
+            headers[name] = data[offset:offset + _HEADER_VALUE_SIZES[value_type]]
+            offset += _HEADER_VALUE_SIZES[value_type]
+        else:
+            raise ValueError(f"Unexpected select response header type: {value_type}")
+    return headers
+
+
+def iter_select_events(read: Callable[[int], bytes]) -> Iterator[Tuple[dict, bytes]]:
+    """
+    逐帧解析查询结果的事件流，校验每帧的CRC32
+
+    Args:
+        read (callable): 读取响应内容的函数，参数为最多读取的字节数，读完时返回空字节串
+
+    Yields:
+        tuple: (事件头部, 负载)，事件头部包含 :message-type、:event-type 等
+    """
+    frames = _FrameBuffer(read)
+    while True:
+        prelude = frames.read_exact(PRELUDE_LENGTH)
+        if not prelude:
+            return
+        total_length, headers_length, prelude_crc = struct.unpack('>III', prelude)
+        if zlib.crc32(prelude[:8]) != prelude_crc:
+            raise ValueError("Unexpected select response framing: prelude CRC32 mismatch")
+        if total_length < PRELUDE_LENGTH + headers_length + MESSAGE_CRC_LENGTH:
+            raise ValueError("Unexpected select response framing: invalid frame length")
+        rest = frames.read_exact(total_length - PRELUDE_LENGTH)
+        if not rest:
+            raise ValueError("Select response ended in the middle of a frame")
+        message, message_crc = rest[:-MESSAGE_CRC_LENGTH], struct.unpack('>I', rest[-MESSAGE_CRC_LENGTH:])[0]
+        if zlib.crc32(message, zlib.crc32(prelude)) != message_crc:
+            raise ValueError("Unexpected select response framing: message CRC32 mismatch")
+        yield _parse_event_headers(message[:headers_length]), message[headers_length:]
+
+
+def _parse_stats(payload: bytes) -> dict:
+    """解析Stats事件中的扫描、处理和返回字节数"""
+    return {re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower(): int(value)
+            for name, value in re.findall(r'"?(Bytes\w+)"?\s*[:>]\s*"?(\d+)', payload.decode('utf-8', 'replace'))}
+
+
+class SelectObjectTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 执行服务端SQL查询
+            result = self._select_object(tool_parameters)
+
+            yield self.create_json_message(result)
+
+            # 生成友好的文本消息
+            text_message = "Query completed successfully!\n"
+            text_message += f"Object key: {result['object_key']}\n"
+            text_message += f"Returned: {result['bytes_returned']} bytes\n"
+            if result.get('truncated'):
+                text_message += f"Result truncated at {result['max_result_bytes']} bytes\n"
+            text_message += f"\n{result['records']}"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Query failed: {str(e)}")
+            raise e
+
+    def _select_object(self, parameters: dict[str, Any]) -> dict:
+        # 获取URL与SQL参数
+        url = parameters.get('url')
+        expression = (parameters.get('sql') or '').strip()
+
+        # 验证必填参数
+        if not url:
+            raise ValueError("Missing required parameter: 'url' must be provided")
+        if not expression:
+            raise ValueError("Missing required parameter: 'sql' must be provided")
+
+        # 获取认证信息（与GetFileByUrlTool保持一致）
+        credentials = self.runtime.credentials if self.runtime else {}
+        access_key_id = credentials.get('access_key_id')
+        access_key_secret = credentials.get('access_key_secret')
+        bucket = credentials.get('bucket')
+        endpoint = credentials.get('endpoint')
+        if not access_key_id or not access_key_secret or not bucket or not endpoint:
+            raise ValueError("Missing required credential: access_key_id, access_key_secret, bucket or endpoint")
+
+        # 解析URL，使用URL中的bucket和endpoint覆盖凭据中的配置
+        parsed_bucket, parsed_endpoint, object_key = parse_tos_url(url)
+        if parsed_bucket:
+            bucket = parsed_bucket
+        if parsed_endpoint:
+            endpoint = parsed_endpoint
+        object_key = unquote_plus(object_key)
+        if not object_key:
+            raise ValueError(f"URL does not point to an object: {url}")
+
+        # 结果大小上限
+        max_result_bytes = parameters.get('max_result_bytes')
+        max_result_bytes = int(max_result_bytes) if max_result_bytes else DEFAULT_MAX_RESULT_BYTES
+        if max_result_bytes <= 0:
+            raise ValueError("max_result_bytes must be a positive integer")
+        max_result_bytes = min(max_result_bytes, MAX_RESULT_BYTES_LIMIT)
+
+        # 创建TOS客户端
+        client = create_client(credentials, endpoint, request_timeout=30, enable_verify_ssl=False)
+
+        # Python SDK未提供SelectObject接口，通过SDK内部的请求方法发送带签名的POST请求，
+        # 与其他接口共用签名、连接池和错误解析（非2xx响应抛出TosServerError）
+        body = json.dumps(self._build_select_request(expression, parameters))
+        response = client._req(bucket=bucket, key=object_key, method='POST', data=body,
+                               headers={'Content-Type': 'application/json'}, params={'select': ''},
+                               func='select_object')
+
+        # 按事件流逐帧读取匹配的记录，超出上限时停止读取
+        chunks = []
+        received = 0
+        truncated = False
+        ended = False
+        stats = None
+        try:
+            for headers, payload in iter_select_events(response.read):
+                if headers.get(':message-type') == 'error':
+                    raise ValueError(f"Select request failed: {headers.get(':error-code')} "
+                                     f"{headers.get(':error-message')}")
+                event_type = headers.get(':event-type')
+                if event_type == 'Records':
+                    if received + len(payload) > max_result_bytes:
+                        chunks.append(payload[:max_result_bytes - received])
+                        received = max_result_bytes
+                        truncated = True
+                        break
+                    chunks.append(payload)
+                    received += len(payload)
+                elif event_type == 'Stats':
+                    stats = _parse_stats(payload)
+                elif event_type == 'End':
+                    ended = True
+                    break
+        finally:
+            response.resp.close()
+
+        # 未收到End事件说明查询被中断，已返回的记录可能不完整
+        if not ended and not truncated:
+            raise ValueError("Select response ended before the End event, the result may be incomplete")
+
+        records = b''.join(chunks).decode('utf-8', errors='replace')
+        return {
+            'status': 'completed',
+            'bucket': bucket,
+            'object_key': object_key,
+            'records': records,
+            'bytes_returned': received,
+            'max_result_bytes': max_result_bytes,
+            'truncated': truncated,
+            'stats': stats
+        }
+
+    def _build_select_request(self, expression: str, parameters: dict[str, Any]) -> dict:
+        """根据输入输出格式参数构造SelectObject请求体"""
+        input_format = (parameters.get('input_format') or 'csv').strip().lower()
+        output_format = (parameters.get('output_format') or input_format).strip().lower()
+        compression = (parameters.get('compression') or 'none').strip().lower()
+        if input_format not in ('csv', 'json'):
+            raise ValueError(f"Unsupported input format: {input_format}")
+        if output_format not in ('csv', 'json'):
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if compression not in ('none', 'gzip'):
+            raise ValueError(f"Unsupported compression type: {compression}")
+
+        field_delimiter = parameters.get('field_delimiter') or ','
+        record_delimiter = (parameters.get('record_delimiter') or '\\n').encode('utf-8').decode('unicode_escape')
+        quote_character = parameters.get('quote_character') or '"'
+
+        if input_format == 'csv':
+            input_serialization = {
+                'CSV': {
+                    'FileHeaderInfo': (parameters.get('csv_header') or 'use').strip().upper(),
+                    'FieldDelimiter': field_delimiter,
+                    'RecordDelimiter': record_delimiter,
+                    'QuoteCharacter': quote_character
+                }
+            }
+        else:
+            input_serialization = {
+                'JSON': {
+                    'Type': (parameters.get('json_type') or 'lines').strip().upper()
+                }
+            }
+        input_serialization['CompressionType'] = compression.upper()
+
+        if output_format == 'csv':
+            output_serialization = {
+                'CSV': {
+                    'FieldDelimiter': field_delimiter,
+                    'RecordDelimiter': record_delimiter,
+                    'QuoteCharacter': quote_character
+                }
+            }
+        else:
+            output_serialization = {
+                'JSON': {
+                    'RecordDelimiter': record_delimiter
+                }
+            }
+
+        return {
+            'Expression': base64.b64encode(expression.encode('utf-8')).decode('ascii'),
+            'ExpressionType': 'SQL',
+            'InputSerialization': input_serialization,
+            'OutputSerialization': output_serialization
+        }
@@ -0,0 +1,366 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Generator, Optional
+
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+from dify_plugin.file.file import File
+
+from .utils import get_content_type_by_extension, read_file_content, get_file_size
+from .tos_client import create_client
+from .integrity import crc64, upload_with_retries
+from .delete_objects import MAX_KEYS_PER_BATCH, delete_keys
+from .profiling import profiled
+
+# 单次同步最多包含的文件数
+MAX_SYNC_FILES = 200
+# 并发上传的文件数
+MAX_CONCURRENT_UPLOADS = 4
+# 清单对象：记录上次同步时各对象的大小、ETag及CRC64/MD5，与目标前缀下的对象一起列举
+MANIFEST_NAME = '.tos-sync-manifest.json'
+MANIFEST_VERSION = 1
+# 进程内缓存的清单数量：清单对象的ETag未变化时无需再次下载
+MANIFEST_CACHE_MAX_SIZE = 64
+_manifest_cache = OrderedDict()
+_manifest_cache_lock = threading.Lock()
+
+
+def _get_cached_manifest(cache_key: tuple, etag: str) -> Optional[dict]:
+    with _manifest_cache_lock:
+        entry = _manifest_cache.get(cache_key)
+        if entry is None or entry[0] != etag:
+            return None
+        _manifest_cache.move_to_end(cache_key)
+        return entry[1]
+
+
+def _put_cached_manifest(cache_key: tuple, etag: str, manifest: dict) -> None:
+    with _manifest_cache_lock:
+        _manifest_cache[cache_key] = (etag, manifest)
+        _manifest_cache.move_to_end(cache_key)
+        while len(_manifest_cache) > MANIFEST_CACHE_MAX_SIZE:
+            _manifest_cache.popitem(last=False)
+
+
+def _normalize_etag(etag: Any) -> str:
+    return str(etag or '').strip('"')
+
+
+class SyncToPrefixTool(Tool):
+    @profiled
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        try:
+            # 从运行时获取凭据并校验
+            credentials = self.runtime.credentials if self.runtime else {}
+            self._validate_credentials(credentials)
+
+            # 执行增量同步（使用运行时凭据）
+            result = self._sync(tool_parameters, credentials)
+
+            yield self.create_json_message(result)
+
+            # 生成详细的文本消息
+            summary = result['summary']
+            text_message = "Dry run completed, no objects were changed\n" if result.get('dry_run') else "Sync completed\n"
+            text_message += f"Prefix: {result['prefix'] or '/'}\n"
+            text_message += f"New: {summary['new']} file\n"
+            text_message += f"Changed: {summary['changed']} file\n"
+            text_message += f"Unchanged: {summary['unchanged']} file\n"
+            text_message += f"Deleted: {summary['deleted']} object\n"
+            text_message += f"Failed: {summary['failed']}\n"
+            text_message += f"Bytes uploaded: {result['bytes_uploaded']}\n"
+            text_message += f"Bytes saved: {result['bytes_saved']}\n"
+
+            changed_files = [f for f in result.get('files', []) if f.get('action') != 'unchanged']
+            if changed_files:
+                text_message += "\nFiles:\n"
+                for file_info in changed_files:
+                    text_message += f"- {file_info.get('action')}: {file_info.get('object_key')} ({file_info.get('status')})\n"
+                    if file_info.get('error'):
+                        text_message += f"  Error: {file_info['error']}\n"
+
+            yield self.create_text_message(text_message)
+        except Exception as e:
+            # 在text中输出失败信息 - 英文消息
+            yield self.create_text_message(f"Failed to sync files: {str(e)}")
+            # 同时抛出异常以保持原有行为
+            raise ValueError(f"Failed to sync files: {str(e)}")
+
+    def _validate_credentials(self, credentials: dict[str, Any]) -> None:
+        # 验证必填字段是否存在
+        required_fields = ['endpoint', 'bucket', 'access_key_id', 'access_key_secret']
+        for field in required_fields:
+            if field not in credentials or not credentials[field]:
+                raise ValueError(f"Missing required credential: {field}")
+
+    def _sync(self, parameters: dict[str, Any], credentials: dict[str, Any]) -> dict:
+        # 获取文件数组、目标前缀和其他参数
+        files = parameters.get('files') or []
+        prefix = (parameters.get('prefix') or '').strip()
+        delete_extras = bool(parameters.get('delete_extras', False))
+        dry_run = bool(parameters.get('dry_run', False))
+        max_retries = int(parameters.get('max_retries', 3))
+
+        # 验证必填参数
+        if not files:
+            raise ValueError("Missing required parameter: files")
+        if len(files) > MAX_SYNC_FILES:
+            raise ValueError(f"Maximum number of files ({MAX_SYNC_FILES}) exceeded")
+        # 空前缀会将整个存储桶根目录作为同步目标（delete_extras 时会删除根目录下的其他对象），因此不允许
+        if not prefix:
+            raise ValueError("Missing required parameter: prefix")
+        if prefix.startswith((' ', '/', '\\')):
+            raise ValueError("Prefix cannot start with space, / or \\ ")
+        prefix = prefix.rstrip('/')
+        key_prefix = f"{prefix}/" if prefix else ''
+        bucket = credentials['bucket']
+
+        # 只获取文件名与大小，不读取内容；同名文件以最后一个为准
+        incoming = OrderedDict()
+        for file in files:
+            filename = self._file_name(file)
+            if filename == MANIFEST_NAME:
+                raise ValueError(f"File name is reserved for the sync manifest: {MANIFEST_NAME}")
+            incoming[filename] = file
+
+        # 初始化TOS客户端（上传时自行校验CRC64，关闭SDK自带的校验）
+        client = create_client(credentials, request_timeout=int(parameters.get('request_timeout', 60)),
+                               enable_crc=False)
+
+        # 一次列举目标前缀下的对象（不含子目录），并读取清单
+        remote, manifest_etag = self._list_prefix(client, bucket, key_prefix)
+        manifest_key = key_prefix + MANIFEST_NAME
+        manifest = self._load_manifest(client, credentials, manifest_key, manifest_etag)
+
+        entries = []
+        for filename, file in incoming.items():
+            object_key = key_prefix + filename
+            entries.append({
+                'filename': filename,
+                'object_key': object_key,
+                'file_url': f"https://{bucket}.{credentials['endpoint']}/{object_key}",
+                'file_size_bytes': get_file_size(file),
+                'action': 'new' if filename not in remote else 'changed'
+            })
+        extras = [name for name in remote if name not in incoming] if delete_extras else []
+
+        # 并发比对并上传：每个任务自行读取文件内容，同一时间最多持有 MAX_CONCURRENT_UPLOADS 个文件的内容
+        checksums = {}
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_UPLOADS, len(entries))) as executor:
+            list(executor.map(
+                lambda entry: self._sync_entry(client, credentials, entry, incoming[entry['filename']],
+                                               remote.get(entry['filename']), manifest.get(entry['filename']),
+                                               dry_run, max_retries, checksums),
+                entries))
+        if not dry_run:
+            delete_errors = {error['key']: f"{error['code']} {error['message']}"
+                             for error in delete_keys(client, bucket, [key_prefix + name for name in extras])}
+        else:
+            delete_errors = {}
+
+        # 更新清单：未变化的文件记录远端当前的ETag，上传成功的文件使用新的ETag与校验值
+        new_manifest = {}
+        files_result = []
+        for entry in entries:
+            filename = entry['filename']
+            etag = entry.pop('etag', None)
+            if entry['status'] == 'success':
+                new_manifest[filename] = dict(checksums[filename], size=entry['file_size_bytes'],
+                                              etag=etag if entry['action'] != 'unchanged' else remote[filename]['etag'])
+            elif entry['status'] == 'failed' and filename in manifest and filename in remote:
+                # 上传失败时保留远端对象原有的记录
+                new_manifest[filename] = manifest[filename]
+            files_result.append(entry)
+        deleted = 0
+        for name in extras:
+            key = key_prefix + name
+            item = {'filename': name, 'object_key': key, 'file_size_bytes': remote[name]['size'], 'action': 'deleted'}
+            if dry_run:
+                item['status'] = 'pending'
+            elif key in delete_errors:
+                item.update({'status': 'failed', 'error': delete_errors[key]})
+                new_manifest[name] = manifest.get(name)
+            else:
+                item['status'] = 'success'
+                deleted += 1
+            files_result.append(item)
+        # 未参与本次同步且仍保留在远端的对象沿用原记录
+        for name in remote:
+            if name not in incoming and name not in extras and name in manifest:
+                new_manifest[name] = manifest[name]
+        new_manifest = {name: record for name, record in new_manifest.items() if record}
+
+        manifest_error = None
+        if not dry_run and new_manifest != manifest:
+            try:
+                self._save_manifest(client, credentials, manifest_key, new_manifest)
+            except Exception as e:
+                # 清单写入失败不影响已完成的上传，下次同步时按列举结果重新比对
+                manifest_error = str(e)
+
+        summary = {
+            'new': sum(1 for entry in entries if entry['action'] == 'new'),
+            'changed': sum(1 for entry in entries if entry['action'] == 'changed'),
+            'unchanged': sum(1 for entry in entries if entry['action'] == 'unchanged'),
+            'deleted': len(extras) if dry_run else deleted,
+            'failed': sum(1 for item in files_result if item['status'] == 'failed')
+        }
+        uploaded = [entry for entry in files_result if entry['action'] in ('new', 'changed')]
+        return {
+            'status': 'completed',
+            'dry_run': dry_run,
+            'prefix': prefix,
+            'manifest_key': manifest_key,
+            'manifest_error': manifest_error,
+            'summary': summary,
+            'success_count': sum(1 for item in files_result if item['status'] == 'success'),
+            'error_count': summary['failed'],
+            # 未变化的文件无需上传，节省的传输量
+            'bytes_saved': sum(entry['file_size_bytes'] for entry in files_result if entry['action'] == 'unchanged'),
+            'bytes_uploaded': sum(entry['file_size_bytes'] for entry in uploaded if entry['status'] == 'success'),
+            'files': files_result
+        }
+
+    def _file_name(self, file: Any) -> str:
+        """获取文件名（不读取内容），同步时保持原始文件名"""
+        if isinstance(file, File):
+            filename = getattr(file, 'filename', None) or getattr(file, 'name', None)
+        elif hasattr(file, 'read'):
+            filename = os.path.basename(getattr(file, 'name', '') or '')
+        elif isinstance(file, str) and os.path.exists(file):
+            filename = os.path.basename(file)
+        else:
+            raise ValueError("Unsupported file type")
+        filename = os.path.basename((filename or '').strip().replace('\\', '/'))
+        if not filename:
+            raise ValueError("Each file must have a file name")
+        return filename
+
+    def _list_prefix(self, client, bucket: str, key_prefix: str) -> tuple[dict, Optional[str]]:
+        """分页列举前缀下的对象，返回 {文件名: 大小/ETag/CRC64} 以及清单对象的ETag"""
+        remote = {}
+        manifest_etag = None
+        continuation_token = None
+        while True:
+            output = client.list_objects_type2(
+                bucket=bucket,
+                prefix=key_prefix,
+                delimiter='/',
+                continuation_token=continuation_token,
+                max_keys=MAX_KEYS_PER_BATCH,
+                list_only_once=True
+            )
+            for obj in output.contents:
+                name = obj.key[len(key_prefix):]
+                if not name:
+                    continue
+                if name == MANIFEST_NAME:
+                    manifest_etag = _normalize_etag(obj.etag)
+                    continue
+                remote[name] = {
+                    'size': obj.size,
+                    'etag': _normalize_etag(obj.etag),
+                    'crc64': str(obj.hash_crc64_ecma) if obj.hash_crc64_ecma is not None else None
+                }
+            if not output.is_truncated or not output.next_continuation_token:
+                break
+            continuation_token = output.next_continuation_token
+        return remote, manifest_etag
+
+    def _load_manifest(self, client, credentials: dict[str, Any], manifest_key: str,
+                       manifest_etag: Optional[str]) -> dict:
+        """读取清单对象；进程内缓存命中（ETag未变化）时无需下载"""
+        if not manifest_etag:
+            return {}
+        cache_key = (credentials['endpoint'], credentials['bucket'], manifest_key)
+        manifest = _get_cached_manifest(cache_key, manifest_etag)
+        if manifest is not None:
+            return manifest
+        try:
+            data = json.loads(client.get_object(bucket=credentials['bucket'], key=manifest_key).read())
+            manifest = data.get('objects') if data.get('version') == MANIFEST_VERSION else None
+        except Exception:
+            # 清单损坏或无法读取时按无清单处理（仅依赖列举结果比对）
+            manifest = None
+        manifest = manifest if isinstance(manifest, dict) else {}
+        _put_cached_manifest(cache_key, manifest_etag, manifest)
+        return manifest
+
+    def _save_manifest(self, client, credentials: dict[str, Any], manifest_key: str, manifest: dict) -> None:
+        body = json.dumps({
+            'version': MANIFEST_VERSION,
+            'updated_at': datetime.now().isoformat(),
+            'objects': manifest
+        }, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        output = client.put_object(
+            bucket=credentials['bucket'],
+            key=manifest_key,
+            content=body,
+            content_type='application/json'
+        )
+        _put_cached_manifest((credentials['endpoint'], credentials['bucket'], manifest_key),
+                             _normalize_etag(output.etag), manifest)
+
+    def _sync_entry(self, client, credentials: dict[str, Any], entry: dict, file: Any, remote: Optional[dict],
+                    record: Optional[dict], dry_run: bool, max_retries: int, checksums: dict) -> None:
+        """
+        比对单个文件并在需要时上传，结果写回entry，校验值写入checksums
+
+        文件内容只在需要比对校验值或上传时读取，且只在本任务内持有；新增或大小变化的文件无需预先计算校验值，
+        CRC64在上传的同时计算。
+        """
+        try:
+            content = None
+            size = entry['file_size_bytes']
+            if size is None or (remote is not None and remote['size'] == size):
+                content = read_file_content(file)
+                size = entry['file_size_bytes'] = len(content)
+            action, file_checksums = self._diff(content, size, remote, record)
+            entry['action'] = action
+            if action == 'unchanged':
+                checksums[entry['filename']] = file_checksums
+                entry['status'] = 'success'
+                return
+            if dry_run:
+                entry['status'] = 'pending'
+                return
+            if content is None:
+                content = read_file_content(file)
+                entry['file_size_bytes'] = len(content)
+            _, extension = os.path.splitext(entry['filename'])
+            # 比对差异时已计算过CRC64的直接复用，否则在上传的同时计算
+            known_crc = int(file_checksums['crc64']) if 'crc64' in file_checksums else None
+            entry['integrity'], etag = upload_with_retries(
+                client, credentials, entry['object_key'], content,
+                get_content_type_by_extension(extension), max_retries, crc64=known_crc)
+            checksums[entry['filename']] = dict(file_checksums, crc64=entry['integrity']['crc64'])
+            entry.update({'status': 'success', 'etag': _normalize_etag(etag)})
+        except Exception as e:
+            entry.update({'status': 'failed', 'error': str(e)})
+
+    def _diff(self, content: Optional[bytes], size: int, remote: Optional[dict],
+              record: Optional[dict]) -> tuple[str, dict]:
+        """
+        判断文件是新增、变化还是未变化，返回 (action, 本地校验值)
+
+        依次比对：大小 -> 列举结果中的CRC64 -> 清单记录（远端ETag与清单一致时，清单中的校验值仍然有效）
+        -> 普通上传对象的ETag（内容的MD5）；均无法确认时按变化处理。新增或大小不同时无需内容，返回空的校验值
+        """
+        if remote is None:
+            return 'new', {}
+        if remote['size'] != size:
+            return 'changed', {}
+        checksums = {'crc64': str(crc64(content))}
+        if remote['crc64']:
+            return ('unchanged' if remote['crc64'] == checksums['crc64'] else 'changed'), checksums
+        if record and record.get('crc64') and record.get('etag') == remote['etag'] and record.get('size') == size:
+            return ('unchanged' if record['crc64'] == checksums['crc64'] else 'changed'), checksums
+        if remote['etag'] and '-' not in remote['etag']:
+            checksums['md5'] = hashlib.md5(content).hexdigest()
+            return ('unchanged' if remote['etag'].lower() == checksums['md5'] else 'changed'), checksums
+        return 'changed', checksums
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .bootstrap import apply_compat_patches, load_tos
+from .endpoint_selector import select_endpoint
+
+# 进程内复用的TOS客户端数量：复用客户端即复用其连接池与SDK的DNS缓存
+CLIENT_CACHE_MAX_SIZE = 32
+# 所有客户端共享的HTTP连接池：预热建立的长连接可被后续任意客户端的请求直接复用
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 64
+
+_clients = OrderedDict()
+_lock = threading.RLock()
+_shared_adapter = None
+
+
+def get_region(credentials: dict[str, Any]) -> str:
+    """获取region：优先使用凭据中的region，否则从endpoint中提取"""
+    region = credentials.get('region')
+    if not region:
+        endpoint = credentials.get('endpoint') or ''
+        if '.' in endpoint:
+            region = endpoint.split('.')[0].replace('tos-', '')
+        else:
+            region = ''
+    return region
+
+
+def get_shared_adapter():
+    """获取所有TOS客户端共享的 requests HTTPAdapter（连接池）"""
+    global _shared_adapter
+    if _shared_adapter is None:
+        with _lock:
+            if _shared_adapter is None:
+                apply_compat_patches()
+                from requests.adapters import HTTPAdapter
+                _shared_adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    return _shared_adapter
+
+
+def warm_connection(host: str, timeout: float = 5) -> bool:
+    """
+    通过共享连接池向主机发送一次匿名HEAD请求（校验证书），建立的长连接留在连接池中，
+    之后TOS客户端访问该主机时可直接复用；服务端返回的任何HTTP状态码都视为预热成功
+
+    Returns:
+        bool: 是否成功建立连接
+    """
+    import requests
+
+    session = requests.Session()
+    # 注意不能关闭该会话：关闭会话会同时关闭共享的连接池
+    session.mount('https://', get_shared_adapter())
+    try:
+        session.head(f"https://{host}/", timeout=timeout, verify=True, allow_redirects=False)
+        return True
+    except Exception:
+        return False
+
+
+def create_client(credentials: dict[str, Any], endpoint: Optional[str] = None, request_timeout: int = 60,
+                  enable_verify_ssl: bool = True, enable_crc: bool = True):
+    """
+    获取TOS客户端，首次调用时才导入 tos SDK
+
+    相同配置的客户端在进程内复用（最多 CLIENT_CACHE_MAX_SIZE 个），所有客户端共享同一个连接池，
+    因此后续调用可以复用已建立（或预热）的连接。客户端是线程安全的，调用方不应关闭返回的客户端。
+
+    Args:
+        credentials (dict): 运行时凭据
+        endpoint (str): 目标域名，默认为凭据中的 endpoint（由 select_endpoint 在候选域名中选择实际传输的域名）
+        request_timeout (int): 请求超时时间（秒）
+        enable_verify_ssl (bool): 凭据未配置 enable_verify_ssl 时的默认值
+        enable_crc (bool): 是否启用SDK自带的CRC64校验；由 integrity 模块自行校验时关闭，避免重复计算
+
+    Returns:
+        tos.TosClientV2: TOS客户端
+    """
+    tos = load_tos()
+    endpoint = select_endpoint(credentials, endpoint)
+    region = get_region(credentials)
+    enable_verify_ssl = credentials.get('enable_verify_ssl', enable_verify_ssl)
+    cache_key = (credentials['access_key_id'], credentials['access_key_secret'], endpoint, region,
+                 enable_verify_ssl, request_timeout, enable_crc)
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is not None:
+            _clients.move_to_end(cache_key)
+            return client
+
+    client = tos.TosClientV2(
+        ak=credentials['access_key_id'],
+        sk=credentials['access_key_secret'],
+        endpoint=endpoint,
+        region=region,
+        enable_verify_ssl=enable_verify_ssl,
+        request_timeout=request_timeout,
+        enable_crc=enable_crc
+    )
+    adapter = get_shared_adapter()
+    client.session.mount('https://', adapter)
+    client.session.mount('http://', adapter)
+
+    with _lock:
+        # 并发创建时以先放入缓存的客户端为准
+        existing = _clients.get(cache_key)
+        if existing is not None:
+            return existing
+        _clients[cache_key] = client
+        # 淘汰最久未使用的客户端（不调用close，避免关闭共享的连接池）
+        while len(_clients) > CLIENT_CACHE_MAX_SIZE:
+            _clients.popitem(last=False)
+    return client
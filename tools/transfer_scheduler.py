@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Generator, Optional, Tuple
+
+# 不超过该大小的传输视为交互式小传输，直接执行，不排队也不限速
+SMALL_TRANSFER_BYTES = 1024 * 1024
+# 同时进行的大传输数量（所有租户共享）
+MAX_LARGE_TRANSFERS_ENV = 'TOS_MAX_LARGE_TRANSFERS'
+DEFAULT_MAX_LARGE_TRANSFERS = 4
+# 排队时间每增加 AGING_SECONDS 秒，排序用的大小减半，避免大传输被持续饿死
+AGING_SECONDS = 10
+# 限速读取下载内容时的块大小
+READ_CHUNK_SIZE = 64 * 1024
+# 服务端单连接限速（x-tos-traffic-limit）允许的范围，单位 bit/s
+MIN_TRAFFIC_LIMIT = 819200
+MAX_TRAFFIC_LIMIT = 838860800
+
+
+def _get_max_large_transfers() -> int:
+    try:
+        return max(1, int(os.environ.get(MAX_LARGE_TRANSFERS_ENV, DEFAULT_MAX_LARGE_TRANSFERS)))
+    except ValueError:
+        return DEFAULT_MAX_LARGE_TRANSFERS
+
+
+def _parse_mb_per_sec(value: Any) -> float:
+    """解析以 MB/s 为单位的凭据配置，未配置或无效时返回0（不限速）"""
+    try:
+        return max(0.0, float(value)) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _transfer_owner(credentials: dict[str, Any]) -> tuple:
+    return credentials.get('endpoint'), credentials.get('bucket'), credentials.get('access_key_id')
+
+
+def _close_response(response) -> None:
+    """关闭未读取的下载响应，释放连接（SDK的GetObjectOutput通过 content.resp 持有底层响应）"""
+    raw = getattr(getattr(response, 'content', None), 'resp', None)
+    close = getattr(raw if raw is not None else response, 'close', None)
+    if close is not None:
+        close()
+
+
+class _Waiter(object):
+    def __init__(self, owner: tuple, size: Optional[int]):
+        self.owner = owner
+        self.size = size
+        self.enqueued_at = time.time()
+
+    def priority(self, active: int, now: float) -> tuple:
+        # 先照顾当前占用通道较少的租户，再按（随等待时间衰减的）传输大小从小到大调度
+        size = self.size if self.size is not None else float('inf')
+        return active, size / (2 ** ((now - self.enqueued_at) / AGING_SECONDS))
+
+
+class TransferScheduler(object):
+    """
+    所有工具共享的传输调度器
+
+    - 小传输（不超过 SMALL_TRANSFER_BYTES）直接执行，保证交互式调用的延迟；
+    - 大传输共享 TOS_MAX_LARGE_TRANSFERS 个通道，按租户占用数和传输大小排队，小的优先；
+    - 凭据配置了 bandwidth_limit 时，大传输使用按 (endpoint, bucket, AccessKey) 共享的令牌桶限速；
+    - 凭据配置了 server_traffic_limit 时，请求附带服务端单连接限速（x-tos-traffic-limit）。
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._active = {}
+        self._active_total = 0
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    def server_options(self, credentials: dict[str, Any]) -> dict:
+        """服务端限速参数，可直接作为 put_object/get_object 的关键字参数"""
+        traffic_limit = _parse_mb_per_sec(credentials.get('server_traffic_limit'))
+        if not traffic_limit:
+            return {}
+        bits = int(traffic_limit * 1024 * 1024 * 8)
+        return {'traffic_limit': min(MAX_TRAFFIC_LIMIT, max(MIN_TRAFFIC_LIMIT, bits))}
+
+    @contextmanager
+    def transfer(self, credentials: dict[str, Any], size: Optional[int]) -> Generator[dict, None, None]:
+        """
+        在调度器中执行一次传输
+
+        Args:
+            credentials (dict): 运行时凭据
+            size (int): 传输的字节数，未知时为None（按大传输处理）
+
+        Yields:
+            dict: 传给 put_object/get_object 的关键字参数（rate_limiter、traffic_limit）
+        """
+        if size is not None and size <= SMALL_TRANSFER_BYTES:
+            yield {}
+            return
+        owner = _transfer_owner(credentials)
+        self._acquire(owner, size)
+        try:
+            options = self.server_options(credentials)
+            limiter = self._get_limiter(owner, credentials)
+            if limiter is not None:
+                options['rate_limiter'] = limiter
+            yield options
+        finally:
+            self._release(owner)
+
+    def download(self, credentials: dict[str, Any], request: Callable[[dict], Any], size: Optional[int] = None,
+                 wrap: Optional[Callable[[Any], Any]] = None) -> Tuple[Any, Any, bytes]:
+        """
+        发起下载请求并读取响应内容；大下载在调度器中排队，并按租户令牌桶限速读取
+
+        已知为大下载时先获取通道再发起请求。大小未知时先发起请求，响应为大下载且没有空闲通道时关闭该响应，
+        排队获取通道后重新请求，排队期间不占用打开的连接。
+
+        Args:
+            credentials (dict): 运行时凭据
+            request (callable): 发起请求的函数，参数为服务端限速参数（traffic_limit），返回带 content_length 的响应
+            size (int): 预计的下载字节数，未知时为None
+            wrap (callable): 可选，包装响应的读取器（例如 ChecksumReader）
+
+        Returns:
+            tuple: (响应, 读取器, 内容)，未指定wrap时读取器即响应本身
+        """
+        options = self.server_options(credentials)
+        owner = _transfer_owner(credentials)
+        if size is None:
+            response = request(options)
+            size = response.content_length
+            if size is not None and size <= SMALL_TRANSFER_BYTES:
+                return self._read_response(response, wrap, None)
+            if self._try_acquire(owner):
+                try:
+                    return self._read_response(response, wrap, self._get_limiter(owner, credentials))
+                finally:
+                    self._release(owner)
+            _close_response(response)
+        elif size <= SMALL_TRANSFER_BYTES:
+            return self._read_response(request(options), wrap, None)
+        with self.transfer(credentials, size) as transfer_options:
+            return self._read_response(request(options), wrap, transfer_options.get('rate_limiter'))
+
+    def _read_response(self, response, wrap: Optional[Callable[[Any], Any]], limiter) -> Tuple[Any, Any, bytes]:
+        reader = wrap(response) if wrap is not None else response
+        if limiter is None:
+            return response, reader, reader.read()
+        chunks = []
+        while True:
+            chunk = reader.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self._consume(limiter, len(chunk))
+            chunks.append(chunk)
+        return response, reader, b''.join(chunks)
+
+    def _get_limiter(self, owner: tuple, credentials: dict[str, Any]):
+        rate = int(_parse_mb_per_sec(credentials.get('bandwidth_limit')) * 1024 * 1024)
+        if rate <= 0:
+            return None
+        with self._limiters_lock:
+            entry = self._limiters.get(owner)
+            if entry is None or entry[0] != rate:
+                from tos.utils import RateLimiter
+                # 令牌桶容量为1秒的流量（至少1 MiB），允许短时突发
+                entry = (rate, RateLimiter(rate, max(rate, SMALL_TRANSFER_BYTES)))
+                self._limiters[owner] = entry
+            return entry[1]
+
+    def _consume(self, limiter, amount: int) -> None:
+        # RateLimiter.acquire 返回 TokenBucketResult(ok, time_to_wait)
+        while True:
+            result = limiter.acquire(amount)
+            if result.ok:
+                return
+            time.sleep(min(1.0, max(0.01, result.time_to_wait or 0.1)))
+
+    def _acquire(self, owner: tuple, size: Optional[int]) -> None:
+        waiter = _Waiter(owner, size)
+        with self._cond:
+            self._waiters.append(waiter)
+            while not (self._active_total < _get_max_large_transfers() and self._next_waiter() is waiter):
+                # 定期醒来以便重新计算随等待时间衰减的优先级
+                self._cond.wait(1.0)
+            self._waiters.remove(waiter)
+            self._active[owner] = self._active.get(owner, 0) + 1
+            self._active_total += 1
+            # 仍有空闲通道时，让下一个排队的传输重新检查
+            self._cond.notify_all()
+
+    def _try_acquire(self, owner: tuple) -> bool:
+        """有空闲通道且没有排队的传输时立即占用通道，否则返回False"""
+        with self._cond:
+            if self._waiters or self._active_total >= _get_max_large_transfers():
+                return False
+            self._active[owner] = self._active.get(owner, 0) + 1
+            self._active_total += 1
+            return True
+
+    def _release(self, owner: tuple) -> None:
+        with self._cond:
+            self._active[owner] -= 1
+            if not self._active[owner]:
+                del self._active[owner]
+            self._active_total -= 1
+            self._cond.notify_all()
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        now = time.time()
+        return min(self._waiters, key=lambda w: w.priority(self._active.get(w.owner, 0), now), default=None)
+
+
+transfer_scheduler = TransferScheduler()
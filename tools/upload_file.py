@@ -1,18 +1,23 @@
 import os
 import uuid
 from datetime import datetime
+from functools import partial
 from typing import Any, Dict, Generator
 from collections.abc import Mapping
 
-import tos
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from dify_plugin.file.file import File
 
-from .utils import get_content_type_by_extension
-import time
+from .utils import (get_content_type_by_extension, build_full_directory, build_object_key, read_file_content,
+                    get_file_size)
+from .tos_client import create_client
+from .idempotency import upload_fingerprint, run_idempotent_upload
+from .upload_jobs import upload_jobs, job_owner
+from .integrity import upload_with_retries
+from .profiling import profiled
 
 class UploadFileTool(Tool):
+    @profiled
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         try:
             # 从运行时获取凭据并校验
@@ -29,7 +34,12 @@ class UploadFileTool(Tool):
             error_count = result.get('error_count', 0)
             
             # 格式化文本消息
-            text_message = f"File upload completed\n"
+            queued_files = [f for f in result.get('files', []) if f.get('status') == 'queued']
+            if queued_files:
+                text_message = f"File upload queued\n"
+                text_message += f"Queued: {len(queued_files)} file\n"
+            else:
+                text_message = f"File upload completed\n"
             text_message += f"Success: {success_count} file\n"
             text_message += f"Failed: {error_count} file\n\n"
             
@@ -46,7 +56,17 @@ class UploadFileTool(Tool):
                         text_message += f"- File name: {filename}\n"
                         text_message += f"  File size: {file_size_mb:.2f} MB ({file_size_bytes} bytes)\n"
                         text_message += f"  File type: {file_type}\n"
-                        text_message += f"  File URL: {file_url}\n\n"
+                        text_message += f"  File URL: {file_url}\n"
+                        if file_info.get('integrity'):
+                            text_message += f"  CRC64: {file_info['integrity']['crc64']} ({file_info['integrity']['status']})\n"
+                        text_message += "\n"
+            
+            if queued_files:
+                text_message += "Queued files (query progress with get_upload_status):\n"
+                for file_info in queued_files:
+                    text_message += f"- File name: {file_info.get('filename', 'unknown')}\n"
+                    text_message += f"  Job ID: {file_info.get('job_id')}\n"
+                    text_message += f"  File URL (provisional, final URL in get_upload_status): {file_info.get('file_url', '')}\n\n"
             
             yield self.create_text_message(text_message)
         except Exception as e:
@@ -175,129 +195,75 @@ class UploadFileTool(Tool):
                 final_filename += original_extension
             # 如果原始文件没有扩展名，不添加默认扩展名
             
-            # 处理目录路径
+            # 处理目录路径并生成对象键
             current_date = datetime.now()
-            date_path = ''
-            if directory_mode == 'yyyy_mm_dd_hierarchy':
-                date_path = f"{current_date.year}/{current_date.month:02d}/{current_date.day:02d}"
-            elif directory_mode == 'yyyy_mm_dd_combined':
-                date_path = f"{current_date.year}{current_date.month:02d}{current_date.day:02d}"
-            
-            # 生成带日期路径的完整目录
-            if date_path:
-                if directory:
-                    full_directory = f"{directory}/{date_path}"
-                else:
-                    full_directory = date_path
-            else:
-                full_directory = directory
-            
-            # 处理文件名模式
-            if filename_mode == 'filename_timestamp':
-                timestamp = current_date.strftime('%Y%m%d%H%M%S%f')[:-3]  # 保留毫秒
-                file_base, file_ext = os.path.splitext(final_filename)
-                final_filename = f"{file_base}_{timestamp}{file_ext}"
-            
-            # 生成对象键
-            object_key = f"{full_directory}/{final_filename}" if full_directory else final_filename
-            
-            # 确保object_key不以/开头
-            object_key = object_key.lstrip('/')
+            full_directory = build_full_directory(directory, directory_mode, current_date)
+            final_filename, object_key = build_object_key(full_directory, final_filename, filename_mode, current_date)
             
             # 初始化TOS客户端
-            enable_verify_ssl = credentials.get('enable_verify_ssl', True)
-            endpoint = credentials['endpoint']
-            region = credentials.get('region')
-            if not region:
-                if '.' in endpoint:
-                    region = endpoint.split('.')[0].replace('tos-', '')
-                else:
-                    region = ''
-            request_timeout = int(parameters.get('request_timeout', 60))
-            client = tos.TosClientV2(
-                ak=credentials['access_key_id'],
-                sk=credentials['access_key_secret'],
-                endpoint=endpoint,
-                region=region,
-                enable_verify_ssl=enable_verify_ssl,
-                request_timeout=request_timeout
-            )
-            
-            # 准备文件内容和计算文件大小
-            file_content = None
-            file_size_bytes = 0
+            client = create_client(credentials, request_timeout=int(parameters.get('request_timeout', 60)),
+                                   enable_crc=False)
             
             try:
-                if isinstance(file, File):
-                    # 处理dify_plugin的File对象
-                    file_content = file.blob
-                    file_size_bytes = len(file.blob)
-                elif hasattr(file, 'read'):
-                    # 处理文件对象
-                    file_content = file.read()
-                    file_size_bytes = len(file_content)
-                    # 重置文件指针
-                    if hasattr(file, 'seek'):
-                        file.seek(0)
-                elif isinstance(file, str):
-                    # 处理文件路径
-                    if os.path.exists(file):
-                        file_size_bytes = os.path.getsize(file)
-                        with open(file, 'rb') as f:
-                            file_content = f.read()
-                    else:
-                        raise ValueError(f"File path does not exist: {file}")
-                elif isinstance(file, bytes):
-                    # 处理字节数据
-                    file_content = file
-                    file_size_bytes = len(file)
-                else:
-                    raise ValueError("Unsupported file type")
-                
                 # 获取内容类型
                 _, extension = os.path.splitext(final_filename)
                 content_type = get_content_type_by_extension(extension)
-                
-                # 上传文件（增加重试与指数退避）
                 max_retries = int(parameters.get('max_retries', 3))
-                last_error = None
-                for attempt in range(1, max_retries + 1):
-                    try:
-                        client.put_object(
-                            bucket=credentials['bucket'],
-                            key=object_key,
-                            content=file_content,
-                            content_type=content_type
-                        )
-                        break
-                    except Exception as e:
-                        last_error = e
-                        if attempt < max_retries:
-                            time.sleep(min(8.0, 2 ** (attempt - 1)))
-                        else:
-                            raise ValueError(f"Failed to upload file: {str(last_error)}")
                 
                 # 构造文件访问URL
                 file_url = f"https://{credentials['bucket']}.{credentials['endpoint']}/{object_key}"
                 
-                # 计算文件大小（MB）
-                file_size_mb = file_size_bytes / (1024 * 1024) if file_size_bytes > 0 else 0
-                
                 # 获取文件类型（不带点）
                 file_type = extension.lstrip('.') if extension else 'unknown'
                 
-                # 构建文件信息
+                # 构建文件信息（文件大小在读取内容后填写）
                 file_info = {
                     'filename': final_filename,
                     'object_key': object_key,
                     'file_url': file_url,
                     'content_type': content_type,
-                    'file_size_bytes': file_size_bytes,
-                    'file_size_mb': round(file_size_mb, 2),
+                    'file_size_bytes': 0,
+                    'file_size_mb': 0,
                     'file_type': file_type,
                     'status': 'success'
                 }
                 
+                # 读取内容、计算上传指纹并上传；Dify重试调用时复用之前（或进行中）的上传结果
+                upload = partial(self._upload_content, client, credentials, file, object_key, content_type,
+                                 max_retries, file_info, {
+                                     'directory': full_directory,
+                                     'filename': filename,
+                                     'filename_mode': filename_mode,
+                                     'source_file_name': source_file_name
+                                 })
+                
+                if parameters.get('async_mode', False):
+                    # 异步模式：文件内容（Dify文件需从URL下载）在后台任务中才读取，立即返回任务ID和最终URL
+                    file_size_bytes = get_file_size(file)
+                    job = upload_jobs.submit(
+                        job_owner(credentials),
+                        object_key,
+                        file_url,
+                        file_size_bytes,
+                        partial(self._run_upload_job, upload)
+                    )
+                    if file_size_bytes is not None:
+                        file_info.update(file_size_bytes=file_size_bytes,
+                                         file_size_mb=round(file_size_bytes / (1024 * 1024), 2))
+                    file_info = dict(file_info, status='queued', job_id=job['job_id'])
+                    return {
+                        'status': 'queued',
+                        'success_count': 0,
+                        'error_count': 0,
+                        'job_ids': [job['job_id']],
+                        'files': [file_info]
+                    }
+                
+                file_info, reused = upload()
+                if reused:
+                    # 复用的结果对应首次上传的对象
+                    file_info['idempotent_replay'] = True
+                
                 # 返回结果
                 return {
                     'status': 'completed',
@@ -320,4 +286,34 @@ class UploadFileTool(Tool):
                     'files': [file_info]
                 }
         except Exception as e:
-            raise ValueError(f"Failed to upload file: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Failed to upload file: {str(e)}")
+    
+    def _put_file(self, client, credentials: dict[str, Any], object_key: str, file_content: bytes, content_type: str,
+                  max_retries: int, file_info: dict, progress=None) -> dict:
+        """上传文件（增加重试与指数退避），成功时返回文件信息"""
+        # 上传过程中计算CRC64并与服务端比对，大文件分片上传时只重传不一致的分片
+        try:
+            integrity, _ = upload_with_retries(client, credentials, object_key, file_content, content_type,
+                                               max_retries, progress)
+        except Exception as e:
+            raise ValueError(f"Failed to upload file: {str(e)}")
+        return dict(file_info, integrity=integrity)
+    
+    def _upload_content(self, client, credentials: dict[str, Any], file: Any, object_key: str, content_type: str,
+                        max_retries: int, file_info: dict, fingerprint_options: dict, progress=None) -> tuple[dict, bool]:
+        """读取文件内容并经幂等缓存上传，返回 (文件信息, 是否复用了之前的结果)"""
+        file_content = read_file_content(file)
+        file_size_bytes = len(file_content)
+        file_info = dict(file_info, file_size_bytes=file_size_bytes,
+                         file_size_mb=round(file_size_bytes / (1024 * 1024), 2))
+        fingerprint = upload_fingerprint(file_content, credentials, **fingerprint_options)
+        return run_idempotent_upload(fingerprint, partial(self._put_file, client, credentials, object_key, file_content,
+                                                          content_type, max_retries, file_info, progress=progress))
+    
+    def _run_upload_job(self, upload, progress) -> dict:
+        """后台任务入口：在工作线程中读取文件内容，仍经过幂等缓存，与同步上传共享进行中或已完成的结果"""
+        file_info, reused = upload(progress=progress)
+        if reused:
+            # 复用的结果对应首次上传的对象，其对象键可能与提交任务时返回的不同
+            file_info['idempotent_replay'] = True
+        return file_info
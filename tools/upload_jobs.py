@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# 后台上传的工作线程数
+UPLOAD_WORKERS_ENV = 'TOS_UPLOAD_WORKERS'
+DEFAULT_UPLOAD_WORKERS = 4
+# 已结束任务的保留时间（秒）
+UPLOAD_JOB_TTL_ENV = 'TOS_UPLOAD_JOB_TTL'
+DEFAULT_UPLOAD_JOB_TTL = 3600
+# 任务表最多记录的任务数（含排队、进行中和已结束的任务）
+MAX_UPLOAD_JOBS = 1000
+# 排队及进行中的任务累计的最大字节数；只有一个未结束的任务时不受限制，保证单个大文件仍可上传
+MAX_PENDING_BYTES_ENV = 'TOS_MAX_PENDING_UPLOAD_BYTES'
+DEFAULT_MAX_PENDING_BYTES = 2 * 1024 * 1024 * 1024
+
+JOB_STATE_QUEUED = 'queued'
+JOB_STATE_RUNNING = 'running'
+JOB_STATE_COMPLETED = 'completed'
+JOB_STATE_FAILED = 'failed'
+
+
+def _get_env_int(name: str, default: int, minimum: int) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+class _UploadJob(object):
+    def __init__(self, owner: tuple, object_key: str, file_url: str, total_bytes: Optional[int]):
+        self.job_id = uuid.uuid4().hex
+        self.owner = owner
+        self.object_key = object_key
+        self.file_url = file_url
+        self.total_bytes = total_bytes
+        self.uploaded_bytes = 0
+        self.state = JOB_STATE_QUEUED
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def on_progress(self, consumed_bytes: int, total_bytes: int, rw_once_bytes: int, type: Any = None) -> None:
+        # TOS SDK 的 data_transfer_listener 回调；重试时 consumed_bytes 会从0重新计数
+        self.uploaded_bytes = consumed_bytes
+        if total_bytes and total_bytes > 0:
+            self.total_bytes = total_bytes
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or now) - self.started_at
+        throughput = round(self.uploaded_bytes / elapsed, 2) if elapsed else 0
+        info = {
+            'job_id': self.job_id,
+            'state': self.state,
+            'object_key': self.object_key,
+            'file_url': self.file_url,
+            'total_bytes': self.total_bytes,
+            'uploaded_bytes': self.uploaded_bytes,
+            'progress_percent': round(self.uploaded_bytes * 100.0 / self.total_bytes, 2) if self.total_bytes else (
+                100.0 if self.state == JOB_STATE_COMPLETED else 0.0),
+            'throughput_bytes_per_sec': throughput,
+            'elapsed_seconds': round(elapsed, 3) if elapsed is not None else None,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'error': self.error
+        }
+        if self.result is not None:
+            info['result'] = self.result
+        return info
+
+
+class UploadJobManager(object):
+    """
+    进程内的后台上传任务管理器
+
+    任务提交到有界线程池中执行；任务表容量有限，已结束的任务在 TOS_UPLOAD_JOB_TTL 秒后过期，
+    任务表被排队或进行中的任务占满，或其累计字节数超过 TOS_MAX_PENDING_UPLOAD_BYTES 时拒绝新的任务。
+    """
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, owner: tuple, object_key: str, file_url: str, total_bytes: Optional[int],
+               func: Callable[[Callable], Any]) -> dict:
+        """
+        提交一个后台上传任务
+
+        Args:
+            owner (tuple): 任务所属的 (endpoint, bucket, access_key_id)，查询时用于隔离不同凭据的任务
+            object_key (str): 目标对象键
+            file_url (str): 预计的文件URL；任务完成后以任务结果中的 object_key 和 file_url 为准
+            total_bytes (int): 待上传的字节数，未知时为None
+            func (callable): 执行上传的函数，参数为可作为 data_transfer_listener 的进度回调，返回值记录为任务结果
+                （返回dict时，其中的 object_key 和 file_url 会更新任务的对象键和URL）
+
+        Returns:
+            dict: 任务的当前状态
+        """
+        job = _UploadJob(owner, object_key, file_url, total_bytes)
+        with self._lock:
+            self._evict(time.time())
+            if len(self._jobs) >= MAX_UPLOAD_JOBS:
+                raise ValueError("Too many pending upload jobs, please retry later")
+            pending = [j for j in self._jobs.values() if j.finished_at is None]
+            pending_bytes = sum(j.total_bytes or 0 for j in pending)
+            max_pending_bytes = _get_env_int(MAX_PENDING_BYTES_ENV, DEFAULT_MAX_PENDING_BYTES, 0)
+            if pending and pending_bytes + (total_bytes or 0) > max_pending_bytes:
+                raise ValueError("Too many bytes pending in upload jobs, please retry later")
+            self._jobs[job.job_id] = job
+            if self._executor is None:
+                workers = _get_env_int(UPLOAD_WORKERS_ENV, DEFAULT_UPLOAD_WORKERS, 1)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tos-upload-job')
+            executor = self._executor
+        executor.submit(self._run, job, func)
+        return job.to_dict()
+
+    def get(self, owner: tuple, job_id: str) -> Optional[dict]:
+        """查询任务状态；任务不存在、已过期或不属于当前凭据时返回None"""
+        with self._lock:
+            self._evict(time.time())
+            job = self._jobs.get(job_id)
+            if job is None or job.owner != owner:
+                return None
+            return job.to_dict()
+
+    def _run(self, job: _UploadJob, func: Callable[[Callable], Any]) -> None:
+        job.state = JOB_STATE_RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = func(job.on_progress)
+            if isinstance(job.result, dict):
+                # 复用之前的上传结果时，实际写入的对象可能与提交时预计的对象键不同
+                job.object_key = job.result.get('object_key', job.object_key)
+                job.file_url = job.result.get('file_url', job.file_url)
+            if job.total_bytes is not None:
+                job.uploaded_bytes = job.total_bytes
+            job.state = JOB_STATE_COMPLETED
+        except Exception as e:
+            job.error = str(e)
+            job.state = JOB_STATE_FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _evict(self, now: float) -> None:
+        ttl = _get_env_int(UPLOAD_JOB_TTL_ENV, DEFAULT_UPLOAD_JOB_TTL, 0)
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at + ttl <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        # 超出容量时优先淘汰最早结束的任务
+        if len(self._jobs) >= MAX_UPLOAD_JOBS:
+            for job_id in [k for k, job in self._jobs.items() if job.finished_at is not None]:
+                del self._jobs[job_id]
+                if len(self._jobs) < MAX_UPLOAD_JOBS:
+                    break
+
+
+upload_jobs = UploadJobManager()
+
+
+def job_owner(credentials: dict[str, Any]) -> tuple:
+    """任务归属：同一endpoint、存储桶和AccessKey的调用才能查询到彼此的任务"""
+    return credentials.get('endpoint'), credentials.get('bucket'), credentials.get('access_key_id')
@@ -1,3 +1,11 @@
+import os
+import re
+from datetime import datetime
+from typing import Any, Optional
+
+from dify_plugin.file.file import File
+
+
 def get_content_type_by_extension(extension: str) -> str:
     """
     根据文件扩展名获取内容类型(MIME类型)
@@ -67,4 +75,126 @@ def get_content_type_by_extension(extension: str) -> str:
     
     # 转换为小写并查找对应的MIME类型
     extension = extension.lower()
-    return content_type_map.get(extension, 'application/octet-stream')
\ No newline at end of file
+    return content_type_map.get(extension, 'application/octet-stream')
+
+
+def parse_tos_url(url: str) -> tuple[str, str, str]:
+    """
+    解析TOS URL格式，提取bucket, endpoint和object_key
+    
+    Args:
+        url (str): TOS文件URL，例如 'https://bucket.tos-cn-beijing.volces.com/path/to/object'
+    
+    Returns:
+        tuple[str, str, str]: (bucket, endpoint, object_key)，object_key可能为空字符串
+    """
+    # 格式1: https://bucket.endpoint/path/to/object
+    match1 = re.match(r'^https?://([^.]+)\.([^/]+)/(.*)$', url)
+    if match1:
+        return match1.group(1), match1.group(2), match1.group(3)
+    
+    # 格式2: https://bucket.endpoint
+    match2 = re.match(r'^https?://([^.]+)\.([^/]+)$', url)
+    if match2:
+        return match2.group(1), match2.group(2), ''
+    
+    # 如果以上格式都不匹配，抛出异常
+    raise ValueError(f"Invalid TOS URL format: {url}")
+
+
+def build_full_directory(directory: str, directory_mode: str, current_date: datetime) -> str:
+    """
+    根据目录模式生成带日期路径的完整目录
+    
+    Args:
+        directory (str): 用户指定的目录，可为空（表示根目录）
+        directory_mode (str): 'no_subdirectory'、'yyyy_mm_dd_combined' 或 'yyyy_mm_dd_hierarchy'
+        current_date (datetime): 用于生成日期路径的时间
+    
+    Returns:
+        str: 完整目录路径，可能为空字符串
+    """
+    date_path = ''
+    if directory_mode == 'yyyy_mm_dd_hierarchy':
+        date_path = f"{current_date.year}/{current_date.month:02d}/{current_date.day:02d}"
+    elif directory_mode == 'yyyy_mm_dd_combined':
+        date_path = f"{current_date.year}{current_date.month:02d}{current_date.day:02d}"
+    
+    if date_path:
+        return f"{directory}/{date_path}" if directory else date_path
+    return directory
+
+
+def build_object_key(full_directory: str, filename: str, filename_mode: str, current_date: datetime) -> tuple[str, str]:
+    """
+    根据文件名模式生成最终文件名和对象键
+    
+    Args:
+        full_directory (str): 完整目录路径（见 build_full_directory）
+        filename (str): 文件名
+        filename_mode (str): 'filename_timestamp' 时在文件名后追加毫秒级时间戳
+        current_date (datetime): 用于生成时间戳的时间
+    
+    Returns:
+        tuple[str, str]: (最终文件名, 对象键)，对象键不以/开头
+    """
+    if filename_mode == 'filename_timestamp':
+        timestamp = current_date.strftime('%Y%m%d%H%M%S%f')[:-3]  # 保留毫秒
+        file_base, file_ext = os.path.splitext(filename)
+        filename = f"{file_base}_{timestamp}{file_ext}"
+    
+    object_key = f"{full_directory}/{filename}" if full_directory else filename
+    return filename, object_key.lstrip('/')
+
+def read_file_content(file: Any) -> bytes:
+    """
+    读取待上传文件的内容
+
+    Args:
+        file: dify_plugin的File对象（从Dify下载）、文件对象、本地文件路径或字节数据
+
+    Returns:
+        bytes: 文件内容
+    """
+    if isinstance(file, File):
+        # 处理dify_plugin的File对象
+        return file.blob
+    if hasattr(file, 'read'):
+        # 处理文件对象，读取后重置文件指针
+        content = file.read()
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return content
+    if isinstance(file, str):
+        # 处理文件路径
+        if not os.path.exists(file):
+            raise ValueError(f"File path does not exist: {file}")
+        with open(file, 'rb') as f:
+            return f.read()
+    if isinstance(file, bytes):
+        return file
+    raise ValueError("Unsupported file type")
+
+
+def get_file_size(file: Any) -> Optional[int]:
+    """
+    在不读取内容的情况下获取待上传文件的大小，无法确定时返回None
+
+    Args:
+        file: 同 read_file_content
+    """
+    if isinstance(file, File):
+        return file.size if file.size is not None and file.size >= 0 else None
+    if isinstance(file, bytes):
+        return len(file)
+    if isinstance(file, str) and os.path.exists(file):
+        return os.path.getsize(file)
+    if hasattr(file, 'seek') and hasattr(file, 'tell'):
+        try:
+            position = file.tell()
+            size = file.seek(0, os.SEEK_END) - position
+            file.seek(position)
+            return size
+        except (OSError, ValueError):
+            return None
+    return None
@@ -0,0 +1,93 @@
+import os
+import socket
+import ssl
+import threading
+import time
+from typing import List, Optional
+
+# 预热的目标主机，逗号分隔，例如 "my-bucket.tos-cn-beijing.volces.com,tos-cn-beijing.volces.com"
+WARMUP_ENDPOINTS_ENV = 'TOS_WARMUP_ENDPOINTS'
+# 预连接超时时间（秒）
+PRECONNECT_TIMEOUT = 5
+
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    获取探测使用的SSL上下文：校验证书与主机名，并加载 certifi（不可用时为系统）的CA证书
+
+    该上下文只用于 preconnect 自行创建的探测连接，不会交给 urllib3 修改，因此可以安全地复用同一个实例。
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_context_lock:
+            if _ssl_context is None:
+                try:
+                    import certifi
+                    _ssl_context = ssl.create_default_context(cafile=certifi.where())
+                except ImportError:
+                    _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def preconnect(host: str, port: int = 443) -> Optional[float]:
+    """
+    探测主机：解析DNS、建立TCP连接并完成（校验证书的）TLS握手后关闭连接
+
+    Returns:
+        Optional[float]: 建连耗时（秒），失败时返回None
+    """
+    start = time.monotonic()
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        context = get_ssl_context()
+        for family, socktype, proto, _, address in addresses:
+            try:
+                with socket.socket(family, socktype, proto) as sock:
+                    sock.settimeout(PRECONNECT_TIMEOUT)
+                    sock.connect(address)
+                    with context.wrap_socket(sock, server_hostname=host):
+                        pass
+                return time.monotonic() - start
+            except OSError:
+                continue
+    except Exception:
+        pass
+    return None
+
+
+def warm_up(endpoints: List[str], background: bool = True) -> None:
+    """
+    预热指定的TOS访问域名：通过所有TOS客户端共享的连接池建立（校验证书的）长连接，
+    首次调用时可直接复用该连接，省去DNS解析、TCP建连与TLS握手
+
+    Args:
+        endpoints (List[str]): 主机名列表，可带协议前缀，例如 'bucket.tos-cn-beijing.volces.com'
+        background (bool): 是否在后台线程中执行，避免阻塞插件启动
+    """
+    hosts = []
+    for endpoint in endpoints:
+        host = endpoint.strip().split('://')[-1].split('/')[0]
+        if host and host not in hosts:
+            hosts.append(host)
+    if not hosts:
+        return
+
+    def _run():
+        from .tos_client import warm_connection
+        for host in hosts:
+            warm_connection(host, timeout=PRECONNECT_TIMEOUT)
+
+    if background:
+        threading.Thread(target=_run, name='tos-warmup', daemon=True).start()
+    else:
+        _run()
+
+
+def warm_up_from_env() -> None:
+    """读取环境变量 TOS_WARMUP_ENDPOINTS 并执行预热（未配置时不执行任何操作）"""
+    endpoints = os.environ.get(WARMUP_ENDPOINTS_ENV, '')
+    if endpoints.strip():
+        warm_up(endpoints.split(','))